@@ -1,4 +1,8 @@
 from dataclasses import dataclass
+from collections import deque
+from typing import Dict, List, Iterable
+import mmap
+import os
 
 @dataclass
 class DigitFounded:
@@ -58,6 +62,81 @@ def advanced_encoder(input_code: str) -> int:
     return int(f'{first_digit}{second_digit}')
 
 
+@dataclass
+class DigitAutomaton:
+    """Aho-Corasick automaton over digit words and digits, compiled to a full transition table"""
+
+    transitions: List[Dict[str, int]]
+    outputs: List[int]  # digit value recognized when reaching the state, -1 if none
+
+    @staticmethod
+    def from_patterns(patterns: Dict[str, int]) -> 'DigitAutomaton':
+        transitions: List[Dict[str, int]] = [{}]
+        outputs = [-1]
+        for pattern, value in patterns.items():
+            state = 0
+            for ch in pattern:
+                if ch not in transitions[state]:
+                    transitions.append({})
+                    outputs.append(-1)
+                    transitions[state][ch] = len(transitions) - 1
+                state = transitions[state][ch]
+            outputs[state] = value
+        # breadth first: fail links, then missing transitions borrowed from the fail state (overlaps like eightwo)
+        fails = [0]*len(transitions)
+        queue = deque(transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            if outputs[state] == -1:
+                outputs[state] = outputs[fails[state]]
+            for ch, next_state in transitions[state].items():
+                fail = fails[state]
+                while fail != 0 and ch not in transitions[fail]:
+                    fail = fails[fail]
+                fails[next_state] = transitions[fail].get(ch, 0)
+                queue.append(next_state)
+            for ch, fail_next_state in transitions[fails[state]].items():
+                transitions[state].setdefault(ch, fail_next_state)
+        return DigitAutomaton(transitions=transitions, outputs=outputs)
+
+    def decode_line(self, input_code: str) -> int:
+        """First and last digit in a single left to right pass"""
+        transitions, outputs = self.transitions, self.outputs
+        first_digit = -1
+        last_digit = -1
+        state = 0
+        for ch in input_code:
+            state = transitions[state].get(ch, 0)
+            if outputs[state] != -1:
+                last_digit = outputs[state]
+                if first_digit == -1:
+                    first_digit = last_digit
+        if first_digit == -1:
+            raise ValueError(f'No digit found in line {input_code.rstrip()!r}')
+        return first_digit*10 + last_digit
+
+
+ADVANCED_DIGIT_AUTOMATON = DigitAutomaton.from_patterns(patterns={**WORDS_TO_NUMBERS, **{str(digit): digit for digit in range(10)}})
+
+
+def iter_file_lines(path: str, use_mmap: bool = False) -> Iterable[str]:
+    with open(path, "rb") as fr:
+        if not use_mmap:
+            for line in fr:
+                yield line.decode()
+            return
+        # mmap rejects empty files
+        if os.fstat(fr.fileno()).st_size == 0:
+            return
+        with mmap.mmap(fr.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for line in iter(mm.readline, b''):
+                yield line.decode()
+
+
+def decode_file(path: str, use_mmap: bool = False) -> int:
+    return sum(ADVANCED_DIGIT_AUTOMATON.decode_line(input_code=line) for line in iter_file_lines(path=path, use_mmap=use_mmap) if line.strip())
+
+
 if __name__ == '__main__':
     # test_code = 'dasks3daslfkj2hnhs'
     # test_code_1 = 'dasks1daslfkjdhnhs'
@@ -82,5 +161,6 @@ if __name__ == '__main__':
         # for line in fr:
         #     print(f'adv encoding of {line} is {advanced_encoder(line)}') 
     print(f'result is ({sum(decoded_rows_adv)})')
+    print(f'result with automaton is ({decode_file("encoded_coordinates.txt")})')
     # for i in decoded_rows_adv:
     #     print(i)
@@ -1,12 +1,11 @@
 from typing import List, Set
 from dataclasses import dataclass
+import numpy as np
 
 START_NODE_TYPE = 'S'
 END_PATH_DUMMY_TYPE = 'EEE'
 TILE_TYPE = '.'
-
-X_MAZE_BOUND = 140
-Y_MAZE_BOUND = 140
+NORTH_CONNECTED_TYPES = {'|', 'L', 'J'}
 
 class NoConnectionException(Exception):
 
@@ -38,13 +37,12 @@ class Coordinate:
     def next_west(self) -> 'Coordinate':
         return Coordinate(self.x - 1, self.y)
 
-    @property
-    def is_out_of_bound(self) -> bool:
-        return self.x < 1 or self.x > X_MAZE_BOUND or self.y < 1 or self.y > Y_MAZE_BOUND
+    def is_out_of_bound(self, x_bound: int, y_bound: int) -> bool:
+        return self.x < 1 or self.x > x_bound or self.y < 1 or self.y > y_bound
 
     @staticmethod
-    def exclude_out_of_bound_coordinates(coordinates: Set['Coordinate']) -> Set['Coordinate']:
-        return {coordinate for coordinate in coordinates if not coordinate.is_out_of_bound}
+    def exclude_out_of_bound_coordinates(coordinates: Set['Coordinate'], x_bound: int, y_bound: int) -> Set['Coordinate']:
+        return {coordinate for coordinate in coordinates if not coordinate.is_out_of_bound(x_bound=x_bound, y_bound=y_bound)}
     
     def __gt__(self, obj: object) -> bool:
         if isinstance(obj, Coordinate):
@@ -64,20 +62,21 @@ class MazeNode:
         return self.type == TILE_TYPE
 
     def get_connected_coordinates(self) -> Set[Coordinate]:
+        """Coordinates the pipe points to, the maze excludes the ones out of its bounds"""
         if self.type == '|':
-            return Coordinate.exclude_out_of_bound_coordinates({self.coordinate.next_north, self.coordinate.next_south})
+            return {self.coordinate.next_north, self.coordinate.next_south}
         if self.type == '-':
-            return Coordinate.exclude_out_of_bound_coordinates({self.coordinate.next_west, self.coordinate.next_east})
+            return {self.coordinate.next_west, self.coordinate.next_east}
         if self.type == 'L':
-            return Coordinate.exclude_out_of_bound_coordinates({self.coordinate.next_north, self.coordinate.next_east})
+            return {self.coordinate.next_north, self.coordinate.next_east}
         if self.type == 'J':
-            return Coordinate.exclude_out_of_bound_coordinates({self.coordinate.next_north, self.coordinate.next_west})
+            return {self.coordinate.next_north, self.coordinate.next_west}
         if self.type == '7':
-            return Coordinate.exclude_out_of_bound_coordinates({self.coordinate.next_south, self.coordinate.next_west})
+            return {self.coordinate.next_south, self.coordinate.next_west}
         if self.type == 'F':
-            return Coordinate.exclude_out_of_bound_coordinates({self.coordinate.next_south, self.coordinate.next_east})
+            return {self.coordinate.next_south, self.coordinate.next_east}
         if self.type == START_NODE_TYPE:  # starting point, like a jolly
-            return Coordinate.exclude_out_of_bound_coordinates({self.coordinate.next_south, self.coordinate.next_north, self.coordinate.next_west, self.coordinate.next_east})
+            return {self.coordinate.next_south, self.coordinate.next_north, self.coordinate.next_west, self.coordinate.next_east}
         return set()
 
     def is_coordinate_connected(self, coordinate: Coordinate) -> bool:
@@ -153,16 +152,25 @@ class AdjacentCornerNodeCombo:
 @dataclass
 class Maze:
 
-    nodes: Set[MazeNode]
+    rows: List[str]  # node types, south to north: node in coordinate (x, y) is rows[y - 1][x - 1]
     loop_pipe_path: List[MazeNode] = None
 
     @staticmethod
     def from_maze_lines(maze_lines: List[str]) -> 'Maze':
-        nodes = []
-        for ri, maze_line in enumerate(maze_lines[::-1]):  # reading from top to bottom, the y system is reversed, that's why we need to invert reading lines
-            maze_row_elements = [MazeNode(type=node_element, coordinate=Coordinate(x=ci + 1, y=ri + 1)) for ci, node_element in enumerate(maze_line.rstrip())]
-            nodes.extend(maze_row_elements)
-        return Maze(nodes=set(nodes))
+        # reading from top to bottom, the y system is reversed, that's why we need to invert reading lines
+        return Maze(rows=[maze_line.rstrip() for maze_line in maze_lines[::-1] if maze_line.rstrip()])
+
+    @property
+    def x_bound(self) -> int:
+        return len(self.rows[0])
+
+    @property
+    def y_bound(self) -> int:
+        return len(self.rows)
+
+    @property
+    def nodes(self) -> Set[MazeNode]:
+        return {MazeNode(type=node_type, coordinate=Coordinate(x=ci + 1, y=ri + 1)) for ri, row in enumerate(self.rows) for ci, node_type in enumerate(row)}
 
     @property
     def tiles(self) -> Set[MazeNode]:
@@ -183,16 +191,20 @@ class Maze:
 
 
     def get_node_from_coordinates(self, coordinate: Coordinate) -> MazeNode:
-        try:
-            return [node for node in self.nodes if node.coordinate == coordinate][0]
-        except IndexError:
+        if coordinate.is_out_of_bound(x_bound=self.x_bound, y_bound=self.y_bound):
             raise NoExistingNodeException(f'no existing node for coordinate {coordinate}')
+        return MazeNode(type=self.rows[coordinate.y - 1][coordinate.x - 1], coordinate=coordinate)
 
     def get_start_node(self) -> MazeNode:
-        return [node for node in self.nodes if node.type == START_NODE_TYPE][0]
+        for ri, row in enumerate(self.rows):
+            ci = row.find(START_NODE_TYPE)
+            if ci != -1:
+                return MazeNode(type=START_NODE_TYPE, coordinate=Coordinate(x=ci + 1, y=ri + 1))
+        raise NoExistingNodeException('no start node in the maze')
 
     def get_connected_nodes_from_current_one(self, current_node: MazeNode) -> Set[MazeNode]:
-        return set(self. get_node_from_coordinates(coordinate=connected_coordinate) for connected_coordinate in current_node.get_connected_coordinates())
+        connected_coordinates = Coordinate.exclude_out_of_bound_coordinates(coordinates=current_node.get_connected_coordinates(), x_bound=self.x_bound, y_bound=self.y_bound)
+        return set(self.get_node_from_coordinates(coordinate=connected_coordinate) for connected_coordinate in connected_coordinates)
 
     def get_next_node_connected_from_following_path(self, current_node: MazeNode, previous_node: MazeNode) -> MazeNode:
         return self.get_node_from_coordinates(coordinate=current_node.get_next_node_connected_coordinate(previous_coordinate=previous_node.coordinate))
@@ -300,6 +312,31 @@ class Maze:
             return False
         return True
 
+    def enclosed_tile_count(self) -> int:
+        """Tiles inside the loop from the ordered loop path: shoelace formula for the area, then Pick's theorem"""
+        if self.loop_pipe_path is None:
+            self.set_loop_path_from_start_node()
+        coordinates = [node.coordinate for node in self.loop_pipe_path]
+        double_area = abs(sum(c.x*c_next.y - c_next.x*c.y for c, c_next in zip(coordinates, coordinates[1:] + coordinates[:1])))
+        # A = I + b/2 - 1
+        return (double_area - len(coordinates)) // 2 + 1
+
+    def get_inside_tiles_mask(self) -> np.ndarray:
+        """Single scanline pass, parity flipped on loop pipes going north: mask[y - 1, x - 1] is True if tile (x, y) is inside the loop"""
+        if self.loop_pipe_path is None:
+            self.set_loop_path_from_start_node()
+        loop_types = {(node.coordinate.x, node.coordinate.y): node.type for node in self.loop_pipe_path}
+        inside_mask = np.zeros((self.y_bound, self.x_bound), dtype=bool)
+        for y in range(1, self.y_bound + 1):
+            is_inside = False
+            for x in range(1, self.x_bound + 1):
+                loop_type = loop_types.get((x, y))
+                if loop_type is None:
+                    inside_mask[y - 1, x - 1] = is_inside
+                elif loop_type in NORTH_CONNECTED_TYPES:
+                    is_inside = not is_inside
+        return inside_mask
+
 if __name__ == '__main__':
     # coord_test = Coordinate(x=3, y=5)
     # assert coord_test.next_north == Coordinate(x=3, y=6)
@@ -350,8 +387,10 @@ if __name__ == '__main__':
     path = maze.get_loop_path_from_start_node()
     print(f'maze farthest path from the starting position requires {len(path)/2} steps')
     maze.set_loop_path_from_start_node(loop_path=path)
-    inside_tiles = [tile for tile in maze.tiles if maze.is_tile_inside_pipe_path_loop(tile_node=tile)]
-    print(f'tiles inside maze are {len(inside_tiles)}')
+    print(f'tiles inside maze are {maze.enclosed_tile_count()}')
+    print(f'tiles inside maze with scanline fill are {maze.get_inside_tiles_mask().sum()}')
+    # inside_tiles = [tile for tile in maze.tiles if maze.is_tile_inside_pipe_path_loop(tile_node=tile)]
+    # print(f'tiles inside maze are {len(inside_tiles)}')
 
     # test_maze_tiles_description = [
     #     '..........',
@@ -419,7 +458,6 @@ if __name__ == '__main__':
     #     'L7JLJL-JLJLJL--JLJ.L',
     # ]
     # test_maze_tiles_c2 = Maze.from_maze_lines(maze_lines=test_maze_tiles_c2_description)
-    # Y_MAZE_BOUND = 10
     # test_maze_tiles_c2.set_loop_path_from_start_node()
     # test_inside_tiles_c2 = [tile for tile in test_maze_tiles_c2.tiles if test_maze_tiles_c2.is_tile_inside_pipe_path_loop(tile_node=tile)]
     # print(f'tiles inside test maze c2 tiles are {len(test_inside_tiles_c2)}')
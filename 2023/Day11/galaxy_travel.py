@@ -108,6 +108,28 @@ class Universe:
         n_vertical_light_jumps = len([row_index for row_index in row_indexes_light_jumps if (row_index > galaxy_coord_a.y and row_index < galaxy_coord_b.y) or (row_index > galaxy_coord_b.y and row_index < galaxy_coord_a.y)])  # space to explode is between the galaxies
         return base_unexploded_min_distance - (n_horizontal_light_jumps + n_vertical_light_jumps) + (n_horizontal_light_jumps * light_jump_explosion_step + n_vertical_light_jumps * light_jump_explosion_step)
 
+    @staticmethod
+    def get_sum_pairwise_distances(values: List[int]) -> int:
+        """Sum of |a - b| over all the pairs, sorting once and keeping the running sum"""
+        sorted_values = sorted(values)
+        tot_distance = 0
+        running_sum = 0
+        for i, value in enumerate(sorted_values):
+            tot_distance += value*i - running_sum
+            running_sum += value
+        return tot_distance
+
+    def get_sum_min_distances_across_galaxies(self, light_jump_explosion_steps: List[int]) -> List[int]:
+        """Sum of min distances across all galaxy pairs for each explosion step, from the unexpanded map in O(n log n)"""
+        assert not self.is_universe_expanded,  'That method can be used if looking still unexpanded universe'
+        galaxy_coordinates = self.get_galaxies_coordinates()
+        # prefix sums: empty rows / columns before each index, so light jumps between two galaxies are a difference of them
+        empty_rows_before = list(itertools.accumulate((self.is_universe_row_only_empty_space(row_id=row_id) for row_id in range(self.space_size_column)), initial=0))
+        empty_columns_before = list(itertools.accumulate((self.is_universe_column_only_empty_space(column_id=column_id) for column_id in range(self.space_size_row)), initial=0))
+        base_unexploded_distance = self.get_sum_pairwise_distances([coordinate.x for coordinate in galaxy_coordinates]) + self.get_sum_pairwise_distances([coordinate.y for coordinate in galaxy_coordinates])
+        n_light_jumps = self.get_sum_pairwise_distances([empty_columns_before[coordinate.x] for coordinate in galaxy_coordinates]) + self.get_sum_pairwise_distances([empty_rows_before[coordinate.y] for coordinate in galaxy_coordinates])
+        return [base_unexploded_distance + n_light_jumps*(light_jump_explosion_step - 1) for light_jump_explosion_step in light_jump_explosion_steps]
+
 if __name__ == '__main__':
     test_universe_lines = [
         '...#......',
@@ -146,6 +168,8 @@ if __name__ == '__main__':
     test_universe = Universe.from_universe_lines(universe_lines=test_universe_lines)
     print(f'Test universe sum of min distance across galaxies is {sum([test_universe.get_min_distance_across_galaxy_from_unexploded_map(galaxy_coord_a=pair_gal[0], galaxy_coord_b=pair_gal[1], light_jump_explosion_step=2)  for pair_gal in test_universe.get_all_galaxies_pairs()])}')
     print(f'Test universe sum of min distance across galaxies far light jump is is {sum([test_universe.get_min_distance_across_galaxy_from_unexploded_map(galaxy_coord_a=pair_gal[0], galaxy_coord_b=pair_gal[1], light_jump_explosion_step=100)  for pair_gal in test_universe.get_all_galaxies_pairs()])}')
+    # approach 3: prefix sums, all the steps at once
+    assert test_universe.get_sum_min_distances_across_galaxies(light_jump_explosion_steps=[2, 10, 100]) == [374, 1030, 8410]
 
     with open(".\space.txt", "r") as fr:
         universe = Universe.from_universe_lines(universe_lines=[line for line in fr])
@@ -158,3 +182,5 @@ if __name__ == '__main__':
     column_indexes_light_jumps = universe.get_column_indexes_to_explode()
     row_indexes_light_jumps = universe.get_row_indexes_to_explode()
     print(f'Universe sum of min distance across galaxies far light jump is is {sum([universe.get_min_distance_across_galaxy_from_unexploded_map(galaxy_coord_a=pair_gal[0], galaxy_coord_b=pair_gal[1], light_jump_explosion_step=1000000, column_indexes_light_jumps=column_indexes_light_jumps, row_indexes_light_jumps=row_indexes_light_jumps)  for pair_gal in universe.get_all_galaxies_pairs()])}')
+    # approach 3: prefix sums, all the steps at once
+    print(f'Universe sum of min distance across galaxies for steps 2 and 1000000 are {universe.get_sum_min_distances_across_galaxies(light_jump_explosion_steps=[2, 1000000])}')
@@ -1,5 +1,10 @@
-from typing import List, Set
+from typing import List, Set, Tuple, Dict, Iterable, Optional
 from dataclasses import dataclass
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import itertools
+import os
+import time
 
 @dataclass(frozen=True)
 class SpringElement:
@@ -35,6 +40,13 @@ class SpringRow:
         elements = [SpringElement(type=el) for el in elements_description.rstrip()]
         return SpringRow(elements=elements)
 
+    @staticmethod
+    def from_record_description(record_description: str, unfold: int = 1) -> Tuple['SpringRow', List[int]]:
+        """'???.### 1,1,3' -> (row, [1, 1, 3]), both unfolded unfold times"""
+        elements_description, sequence_description = record_description.rstrip().split(' ')
+        sequence = [int(element) for element in sequence_description.split(',')]
+        return SpringRow.from_elements_string(elements_description=UNKNOWN_SPRING.type.join([elements_description]*unfold)), sequence*unfold
+
     @property
     def is_final_version(self) -> bool:
         return not any([elem for elem in self.elements if elem == UNKNOWN_SPRING])
@@ -124,6 +136,28 @@ class SpringRow:
     def get_number_spring_rows_that_fits_sequence(self, sequence: List[int]) -> int:
         return len(self.get_spring_rows_that_fits_sequence(sequence))
 
+    def get_number_arrangements_for_sequence(self, sequence: List[int]) -> int:
+        """Exact count, no candidate row built: table over (group index, current run length), rolled position by position"""
+        states: Dict[Tuple[int, int], int] = {(0, 0): 1}
+        for element_type in self.string_representation:
+            new_states = defaultdict(int)
+            for (group_index, run_length), count in states.items():
+                if element_type != OPERATIONAL_SPRING.type:
+                    # element as damaged: extend the current run, if the group allows it
+                    if group_index < len(sequence) and run_length < sequence[group_index]:
+                        new_states[(group_index, run_length + 1)] += count
+                if element_type != DAMAGED_SPRING.type:
+                    # element as operational: close the run only if the group is complete
+                    if run_length == 0:
+                        new_states[(group_index, 0)] += count
+                    elif run_length == sequence[group_index]:
+                        new_states[(group_index + 1, 0)] += count
+            states = new_states
+        return sum(
+            count for (group_index, run_length), count in states.items()
+            if (group_index == len(sequence) and run_length == 0) or (group_index == len(sequence) - 1 and run_length == sequence[group_index])
+        )
+
     @property
     def is_allowed_consider_period_adding_unknown_spring_at_the_end(self) -> bool:
         return self.elements[0] != DAMAGED_SPRING
@@ -140,6 +174,51 @@ class SpringRow:
     def __hash__(self) -> int:
         return hash(self.string_representation)
 
+def count_records_arrangements(record_descriptions: List[str], unfold: int = 1) -> Tuple[int, int]:
+    """(tot arrangements, n rows) of a chunk of records, worker side"""
+    tot_arrangements = 0
+    n_rows = 0
+    for record_description in record_descriptions:
+        if not record_description.strip():
+            continue
+        spring_row, sequence = SpringRow.from_record_description(record_description=record_description, unfold=unfold)
+        tot_arrangements += spring_row.get_number_arrangements_for_sequence(sequence=sequence)
+        n_rows += 1
+    return tot_arrangements, n_rows
+
+def iter_record_chunks(path: str, chunk_size: int) -> Iterable[List[str]]:
+    with open(path, "r") as fr:
+        while True:
+            chunk = list(itertools.islice(fr, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+def solve_records(path: str, unfold: int = 1, workers: Optional[int] = None, chunk_size: int = 256) -> int:
+    """Stream the records file in chunks over a process pool, keeping at most 2 chunks per worker in flight"""
+    start_time = time.time()
+    tot_arrangements = 0
+    tot_rows = 0
+    workers = workers if workers is not None else os.cpu_count()
+    max_in_flight = 2*workers
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = set()
+        for chunk in iter_record_chunks(path=path, chunk_size=chunk_size):
+            if len(in_flight) >= max_in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    arrangements, n_rows = future.result()
+                    tot_arrangements += arrangements
+                    tot_rows += n_rows
+            in_flight.add(executor.submit(count_records_arrangements, chunk, unfold))
+        for future in in_flight:
+            arrangements, n_rows = future.result()
+            tot_arrangements += arrangements
+            tot_rows += n_rows
+    elapsed_s = time.time() - start_time
+    print(f'Processed {tot_rows} rows in {elapsed_s:.2f}s ({tot_rows/elapsed_s if elapsed_s > 0 else float("inf"):.0f} rows/s)')
+    return tot_arrangements
+
 if __name__ == '__main__':
     test_sr_description = '#??????#??.'
     test_sr = SpringRow.from_elements_string(elements_description=test_sr_description)
@@ -294,6 +373,13 @@ if __name__ == '__main__':
         # print(n_combo_base*(n_combo_middle**4))
         tot_test_arrangements_unfolded5 += n_combo_base*(n_combo_middle**4)
     print(f'Test tot unfolded arrangements is {tot_test_arrangements_unfolded5}')
+    # exact counting, any unfold factor
+    for unfold in [1, 5, 50]:
+        tot_test_arrangements_exact = 0
+        for spring_seq_description in test_springs:
+            spring_row, sequence = SpringRow.from_record_description(record_description=spring_seq_description, unfold=unfold)
+            tot_test_arrangements_exact += spring_row.get_number_arrangements_for_sequence(sequence=sequence)
+        print(f'Test tot arrangements unfolded {unfold} times is {tot_test_arrangements_exact}')
 
     # # part 1
     # tot_arrangements = 0
@@ -305,6 +391,15 @@ if __name__ == '__main__':
 
     #         tot_arrangements += len(spring_row.get_spring_rows_that_fits_sequence(sequence))
     # print(f'Tot arrangements is {tot_arrangements}')
+    # part 2 exact
+    # tot_arrangements_unfolded5 = 0
+    # with open("springs.txt", "r") as fr:
+    #     for line in fr:
+    #         spring_row, sequence = SpringRow.from_record_description(record_description=line, unfold=5)
+    #         tot_arrangements_unfolded5 += spring_row.get_number_arrangements_for_sequence(sequence=sequence)
+    # print(f'Tot unfolded arrangements is {tot_arrangements_unfolded5}')
+    # part 2 exact, over all cores
+    # print(f'Tot unfolded arrangements is {solve_records(path="springs.txt", unfold=5, workers=None)}')
     # part 2
     # exploded5_arrangements = 0
     # exploded5_arrangements_experiment = 0
@@ -1,8 +1,12 @@
-from typing import List, Tuple, Set
+from typing import List, Tuple, Set, Optional, Iterable
 from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import itertools
+import os
 
 VERTICAL = 'V'
 HORIZONTAL = 'H'
+ROCK = '#'
 
 @dataclass(frozen=True)
 class SymmetricDescription:
@@ -142,6 +146,87 @@ class PatternMirror:
         new_elements = [[element if not (ci == col_index and ri == row_index) else opposite for ci, element in enumerate(el_row)] for ri, el_row in enumerate(self.reflection_row_elements)]
         return PatternMirror(reflection_row_elements=new_elements)
 
+    @property
+    def row_codes(self) -> List[int]:
+        """Every row as an int, a bit set per rock"""
+        return [sum(1 << ci for ci, element in enumerate(row_mirror) if element == ROCK) for row_mirror in self.reflection_row_elements]
+
+    @property
+    def column_codes(self) -> List[int]:
+        column_codes = [0]*self.columnar_size
+        for ri, row_mirror in enumerate(self.reflection_row_elements):
+            for ci, element in enumerate(row_mirror):
+                if element == ROCK:
+                    column_codes[ci] |= 1 << ri
+        return column_codes
+
+    @staticmethod
+    def get_reflection_index_with_differences(codes: List[int], n_differences: int) -> int:
+        """First index i with the mirror between i and i + 1 where mirrored codes differ by exactly n_differences bits, -1 if none"""
+        for index in range(len(codes) - 1):
+            differences = 0
+            for i in range(min(index + 1, len(codes) - index - 1)):
+                differences += bin(codes[index - i] ^ codes[index + i + 1]).count('1')
+                if differences > n_differences:
+                    break
+            if differences == n_differences:
+                return index
+        return -1
+
+    def get_symmetry_with_differences(self, n_differences: int = 0) -> Optional[SymmetricDescription]:
+        """Symmetry that needs exactly n_differences smudges fixed, vertical first as in get_factor"""
+        vertical_index = self.get_reflection_index_with_differences(codes=self.column_codes, n_differences=n_differences)
+        if vertical_index != -1:
+            return SymmetricDescription(type=VERTICAL, index=vertical_index)
+        horizontal_index = self.get_reflection_index_with_differences(codes=self.row_codes, n_differences=n_differences)
+        if horizontal_index != -1:
+            return SymmetricDescription(type=HORIZONTAL, index=horizontal_index)
+        return None
+
+    def get_factor_with_smudges(self, n_smudges: int = 0) -> int:
+        symmetry_point = self.get_symmetry_with_differences(n_differences=n_smudges)
+        if symmetry_point is None:
+            raise Exception(f'No symmetry with {n_smudges} smudges in {self}')
+        return self.get_factor_for_symmetry(symmetry_point=symmetry_point)
+
+def iter_patterns(path: str, buffer_size: int = 1 << 20) -> Iterable[PatternMirror]:
+    """One pattern at a time from a buffered reader, patterns separated by empty lines"""
+    current_mirror_description_elements = []
+    with open(path, "r", buffering=buffer_size) as fr:
+        for line in fr:
+            line = line.rstrip()
+            if line == '':
+                if current_mirror_description_elements:
+                    yield PatternMirror.from_line_descriptions(line_descriptions=current_mirror_description_elements)
+                current_mirror_description_elements = []
+                continue
+            current_mirror_description_elements.append(line)
+    if current_mirror_description_elements:
+        yield PatternMirror.from_line_descriptions(line_descriptions=current_mirror_description_elements)
+
+def score_patterns(pattern_mirrors: List[PatternMirror], n_smudges: int = 0) -> int:
+    return sum(pm.get_factor_with_smudges(n_smudges=n_smudges) for pm in pattern_mirrors)
+
+def score_file(path: str, smudges: int = 0, workers: Optional[int] = None, chunk_size: int = 512) -> int:
+    """Sum of pattern factors, chunks of patterns scored over a process pool with at most 2 chunks per worker in flight"""
+    workers = workers if workers is not None else os.cpu_count()
+    patterns = iter_patterns(path=path)
+    if workers <= 1:
+        return score_patterns(pattern_mirrors=patterns, n_smudges=smudges)
+    tot_factor = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = set()
+        while True:
+            chunk = list(itertools.islice(patterns, chunk_size))
+            if not chunk:
+                break
+            if len(in_flight) >= 2*workers:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                tot_factor += sum(future.result() for future in done)
+            in_flight.add(executor.submit(score_patterns, chunk, smudges))
+        tot_factor += sum(future.result() for future in in_flight)
+    return tot_factor
+
 if __name__ == '__main__':
     test_pattern_description = [
         '#.##..##.',
@@ -198,10 +283,15 @@ if __name__ == '__main__':
     # for l in new_mirror_h_test.reflection_row_elements:
     #     print(l)
     assert new_mirror_h_test.get_factor_for_symmetry(symmetry_point=new_symmetry_test) == 100
+    assert test_pattern.get_factor_with_smudges(n_smudges=0) == 5
+    assert test_pattern.get_factor_with_smudges(n_smudges=1) == 300
+    assert test_pattern_h.get_factor_with_smudges(n_smudges=0) == 400
+    assert test_pattern_h.get_factor_with_smudges(n_smudges=1) == 100
     
 
 
-    with open(".\mirror.txt", "r") as fr:
+    mirror_path = ".\mirror.txt"
+    with open(mirror_path, "r") as fr:
         pattern_mirrors: List[PatternMirror] = []
         current_mirror_description_elements = []
         for line in fr:
@@ -221,4 +311,7 @@ if __name__ == '__main__':
     for pm in pattern_mirrors:
         smudge_mirror, new_symmetry = pm.get_mirror_and_new_symmetry_with_smudge()
         tot_factor_smudge += smudge_mirror.get_factor_for_symmetry(symmetry_point=new_symmetry)
-    print(f'Sum of pattern factors considering smudge is {tot_factor_smudge}')
\ No newline at end of file
+    print(f'Sum of pattern factors considering smudge is {tot_factor_smudge}')
+    print(f'Sum of pattern factors considering smudge with bitmask search is {sum([pm.get_factor_with_smudges(n_smudges=1) for pm in pattern_mirrors])}')
+    print(f'Sum of pattern factors streaming the file is {score_file(path=mirror_path, smudges=0)}')
+    print(f'Sum of pattern factors streaming the file considering smudge is {score_file(path=mirror_path, smudges=1)}')
\ No newline at end of file
@@ -1,11 +1,18 @@
 from dataclasses import dataclass
-from typing import List
+from typing import List, Optional
+import numpy as np
 
 ROCK_STANDING = '#'
 ROCK_ROLLING = 'O'
 SPACE = '.'
 OUT_OF_BORDER = '*'
 
+# element codes for the numpy map
+CODE_SPACE = 0
+CODE_ROCK_ROLLING = 1
+CODE_ROCK_STANDING = 2
+ELEMENT_CODES = {SPACE: CODE_SPACE, ROCK_ROLLING: CODE_ROCK_ROLLING, ROCK_STANDING: CODE_ROCK_STANDING}
+
 @dataclass
 class RockMap:
     
@@ -146,6 +153,118 @@ class RockMap:
                     full_rock_weight += rock_weight
         return full_rock_weight
 
+    def spin_n(self, n_spins: int, max_history: Optional[int] = None) -> int:
+        """n tilt spins through the numpy map (see NumpyRockMap.spin_n), map updated, full rock weight returned"""
+        np_rock_map = NumpyRockMap.from_rock_map(rock_map=self)
+        full_rock_weight = np_rock_map.spin_n(n_spins=n_spins, max_history=max_history)
+        self.elements = np_rock_map.to_rock_map().elements
+        return full_rock_weight
+
+@dataclass
+class NumpyRockMap:
+
+    grid: np.ndarray  # element codes, row 0 is north
+
+    @staticmethod
+    def from_lines(lines: List[str]) -> 'NumpyRockMap':
+        return NumpyRockMap(grid=np.array([[ELEMENT_CODES[el] for el in row_el] for row_el in lines], dtype=np.uint8))
+
+    @staticmethod
+    def from_rock_map(rock_map: RockMap) -> 'NumpyRockMap':
+        return NumpyRockMap.from_lines(lines=rock_map.elements)
+
+    def to_rock_map(self) -> RockMap:
+        code_elements = {code: el for el, code in ELEMENT_CODES.items()}
+        return RockMap(elements=[[code_elements[code] for code in row_codes] for row_codes in self.grid.tolist()])
+
+    def print_visualization(self) -> None:
+        self.to_rock_map().print_visualization()
+
+    @staticmethod
+    def get_grid_tilted_to_start(grid: np.ndarray) -> np.ndarray:
+        """Roll everything towards index 0 along axis 0: per segment between standing rocks, rollers counted and rewritten at the segment start"""
+        is_standing = grid == CODE_ROCK_STANDING
+        n_rows, n_cols = grid.shape
+        row_indexes = np.arange(n_rows)[:, None]
+        segment_ids = np.cumsum(is_standing, axis=0) + np.arange(n_cols)[None, :]*(n_rows + 1)
+        n_segment_rollers = np.bincount(segment_ids.ravel(), weights=(grid == CODE_ROCK_ROLLING).ravel(), minlength=n_cols*(n_rows + 1))
+        last_standing_row = np.maximum.accumulate(np.where(is_standing, row_indexes, -1), axis=0)
+        offset_in_segment = row_indexes - last_standing_row - 1
+        return np.where(
+            is_standing,
+            CODE_ROCK_STANDING,
+            np.where(offset_in_segment < n_segment_rollers[segment_ids], CODE_ROCK_ROLLING, CODE_SPACE),
+        ).astype(np.uint8)
+
+    def tilt_north(self) -> None:
+        self.grid = self.get_grid_tilted_to_start(grid=self.grid)
+
+    def tilt_south(self) -> None:
+        self.grid = self.get_grid_tilted_to_start(grid=self.grid[::-1])[::-1]
+
+    def tilt_west(self) -> None:
+        self.grid = self.get_grid_tilted_to_start(grid=self.grid.T).T
+
+    def tilt_east(self) -> None:
+        self.grid = self.get_grid_tilted_to_start(grid=self.grid.T[::-1])[::-1].T
+
+    def tilt_spin(self) -> None:
+        self.tilt_north()
+        self.tilt_west()
+        self.tilt_south()
+        self.tilt_east()
+
+    @property
+    def rolling_fingerprint(self) -> bytes:
+        """Rolling rocks layout as packed bitset, standing rocks never move"""
+        return np.packbits(self.grid == CODE_ROCK_ROLLING).tobytes()
+
+    def set_rolling_fingerprint(self, fingerprint: bytes) -> None:
+        is_rolling = np.unpackbits(np.frombuffer(fingerprint, dtype=np.uint8), count=self.grid.size).reshape(self.grid.shape).astype(bool)
+        self.grid = np.where(self.grid == CODE_ROCK_STANDING, CODE_ROCK_STANDING, np.where(is_rolling, CODE_ROCK_ROLLING, CODE_SPACE)).astype(np.uint8)
+
+    def spin_n(self, n_spins: int, max_history: Optional[int] = None) -> int:
+        """
+        n tilt spins, jumping ahead with modular arithmetic at the first repeated layout, and the final full rock weight.
+        max_history caps the layouts kept: once reached, the remaining spins go through spin_n_bounded.
+        """
+        history = {self.rolling_fingerprint: 0}
+        fingerprints = [self.rolling_fingerprint]  # fingerprints[i] is the layout after i spins
+        for i in range(1, n_spins + 1):
+            if max_history is not None and len(fingerprints) >= max_history:
+                return self.spin_n_bounded(n_spins=n_spins - i + 1)
+            self.tilt_spin()
+            fingerprint = self.rolling_fingerprint
+            if fingerprint in history:
+                cycle_start = history[fingerprint]
+                final_spin = cycle_start + (n_spins - i) % (i - cycle_start)
+                self.set_rolling_fingerprint(fingerprint=fingerprints[final_spin])
+                break
+            history[fingerprint] = i
+            fingerprints.append(fingerprint)
+        return self.get_full_rock_weight()
+
+    def spin_n_bounded(self, n_spins: int) -> int:
+        """n tilt spins keeping a single layout: Brent cycle detection, then at most one more cycle to get the phase"""
+        tortoise = self.rolling_fingerprint
+        power = cycle_length = 1
+        for i in range(1, n_spins + 1):
+            self.tilt_spin()
+            if self.rolling_fingerprint == tortoise:
+                for _ in range((n_spins - i) % cycle_length):
+                    self.tilt_spin()
+                break
+            if power == cycle_length:
+                tortoise = self.rolling_fingerprint
+                power *= 2
+                cycle_length = 0
+            cycle_length += 1
+        return self.get_full_rock_weight()
+
+    def get_full_rock_weight(self) -> int:
+        rows_weight = np.arange(self.grid.shape[0], 0, -1)
+        return int(((self.grid == CODE_ROCK_ROLLING).sum(axis=1)*rows_weight).sum())
+
 if __name__ == '__main__':
     test_rock_map_d = [
         'O....#....',
@@ -174,6 +293,9 @@ if __name__ == '__main__':
     # test_rock_map.print_visualization()
     # print('')
     print(f'Test rock map full weight after tilt north is {test_rock_map.get_full_rock_weight()}')
+    test_np_rock_map = NumpyRockMap.from_lines(lines=test_rock_map_d)
+    test_np_rock_map.tilt_north()
+    assert test_np_rock_map.get_full_rock_weight() == test_rock_map.get_full_rock_weight()
     # test_rock_map.tilt_west()
     # test_rock_map.print_visualization()
     # print('')
@@ -184,6 +306,8 @@ if __name__ == '__main__':
     # test_rock_map.print_visualization()
     # print('')
     
+    test_rock_map_for_spin = RockMap.from_lines(lines=test_rock_map_d)
+    print(f'Test rock map full weight after 1000000000 spins is {test_rock_map_for_spin.spin_n(n_spins=1000000000)}')
     # print('reinitialize original map test')
     # test_rock_map_for_spin = RockMap.from_lines(lines=test_rock_map_d)
     # for i in range(1000000000):
@@ -195,4 +319,6 @@ if __name__ == '__main__':
     with open(".\mrocks.txt", "r") as fr:
         rock_map = RockMap.from_lines(lines=[line.rstrip() for line in fr])
     rock_map.tilt_north()
-    print(f'Rock map full weight after tilt north is {rock_map.get_full_rock_weight()}')
\ No newline at end of file
+    print(f'Rock map full weight after tilt north is {rock_map.get_full_rock_weight()}')
+    rock_map_for_spin = NumpyRockMap.from_lines(lines=[row_el for row_el in rock_map.elements])
+    print(f'Rock map full weight after 1000000000 spins is {rock_map_for_spin.spin_n(n_spins=1000000000)}')
\ No newline at end of file
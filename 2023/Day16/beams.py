@@ -1,5 +1,8 @@
-from typing import List, Tuple
+from typing import List, Tuple, Dict, Optional
 from dataclasses import dataclass
+from collections import deque
+from functools import cached_property
+from concurrent.futures import ProcessPoolExecutor
 
 # puzzle mocked \ as $, to read correctly, not the escapes
 
@@ -209,6 +212,159 @@ class MirrorMap:
         for tr in self.tiles:
             print(''.join([tile.element_beam_invested for tile in tr]))
 
+# compiled engine: elements as small ints, directions as 2 bit codes, clockwise from north
+DIR_N, DIR_E, DIR_S, DIR_W = 0, 1, 2, 3
+DIRECTION_DX = (0, 1, 0, -1)
+DIRECTION_DY = (-1, 0, 1, 0)
+VECTOR_DIRECTION_CODES = {V_N: DIR_N, V_E: DIR_E, V_S: DIR_S, V_W: DIR_W}
+ELEMENT_CODES = {SPACE: 0, MIRROR_NW_SE: 1, MIRROR_SW_NE: 2, SPLITTER_H: 3, SPLITTER_V: 4}
+# [element code][incoming direction] -> outgoing directions, same rules of get_vectors_through_mirror_element
+NEXT_DIRECTIONS = (
+    ((DIR_N,), (DIR_E,), (DIR_S,), (DIR_W,)),
+    ((DIR_E,), (DIR_N,), (DIR_W,), (DIR_S,)),
+    ((DIR_W,), (DIR_S,), (DIR_E,), (DIR_N,)),
+    ((DIR_W, DIR_E), (DIR_E,), (DIR_W, DIR_E), (DIR_W,)),
+    ((DIR_N,), (DIR_N, DIR_S), (DIR_S,), (DIR_N, DIR_S)),
+)
+SPLITTER_EXIT_DIRECTIONS = {ELEMENT_CODES[SPLITTER_H]: (DIR_W, DIR_E), ELEMENT_CODES[SPLITTER_V]: (DIR_N, DIR_S)}
+
+@dataclass
+class CompiledMirrorMap:
+
+    width: int
+    height: int
+    cells: bytes  # element code per cell, row major
+
+    @staticmethod
+    def from_mirror_map(mirror_map: MirrorMap) -> 'CompiledMirrorMap':
+        return CompiledMirrorMap(
+            width=len(mirror_map.tiles[0]),
+            height=len(mirror_map.tiles),
+            cells=bytes(ELEMENT_CODES[tile.element] for tr in mirror_map.tiles for tile in tr),
+        )
+
+    def spread_beam(self, edge_position: Position, vector: Vector) -> bytearray:
+        """Visited state, one byte per cell with a bit per direction already passed, for a beam entering edge_position"""
+        width, height, cells = self.width, self.height, self.cells
+        visited = bytearray(width*height)
+        start_cell = edge_position.y*width + edge_position.x
+        queue = deque((edge_position.x, edge_position.y, direction) for direction in NEXT_DIRECTIONS[cells[start_cell]][VECTOR_DIRECTION_CODES[vector]])
+        while queue:
+            x, y, direction = queue.popleft()
+            cell = y*width + x
+            direction_bit = 1 << direction
+            if visited[cell] & direction_bit:
+                continue
+            visited[cell] |= direction_bit
+            x += DIRECTION_DX[direction]
+            y += DIRECTION_DY[direction]
+            if x < 0 or y < 0 or x >= width or y >= height:
+                continue
+            next_cell = y*width + x
+            for next_direction in NEXT_DIRECTIONS[cells[next_cell]][direction]:
+                if not visited[next_cell] & (1 << next_direction):
+                    queue.append((x, y, next_direction))
+        return visited
+
+    def get_n_energized_tiles(self, edge_position: Position, vector: Vector) -> int:
+        visited = self.spread_beam(edge_position=edge_position, vector=vector)
+        return len(visited) - visited.count(0)
+
+    def get_edge_positions_and_vectors(self) -> List[Tuple[Position, Vector]]:
+        edge_position_and_vectors = []
+        for x in range(self.width):
+            edge_position_and_vectors.append((Position(x=x, y=0), V_S))
+            edge_position_and_vectors.append((Position(x=x, y=self.height - 1), V_N))
+        for y in range(self.height):
+            edge_position_and_vectors.append((Position(x=0, y=y), V_E))
+            edge_position_and_vectors.append((Position(x=self.width - 1, y=y), V_W))
+        return edge_position_and_vectors
+
+    def walk_segment(self, x: int, y: int, direction: int) -> Tuple[int, Optional[int]]:
+        """Cells bitset walked by a single beam until it leaves the map or splits, and the splitter cell where it splits (None if it does not)"""
+        energized = 0
+        seen_states = set()
+        while True:
+            cell = y*self.width + x
+            energized |= 1 << cell
+            if (cell, direction) in seen_states:
+                return energized, None
+            seen_states.add((cell, direction))
+            x += DIRECTION_DX[direction]
+            y += DIRECTION_DY[direction]
+            if x < 0 or y < 0 or x >= self.width or y >= self.height:
+                return energized, None
+            next_cell = y*self.width + x
+            next_directions = NEXT_DIRECTIONS[self.cells[next_cell]][direction]
+            if len(next_directions) == 2:
+                return energized | (1 << next_cell), next_cell
+            direction = next_directions[0]
+
+    @cached_property
+    def splitter_exit_reach(self) -> Dict[Tuple[int, int], int]:
+        """Energized cells bitset reached from each (splitter cell, outgoing direction), computed once per map"""
+        splitter_exits = {cell: SPLITTER_EXIT_DIRECTIONS[element_code] for cell, element_code in enumerate(self.cells) if element_code in SPLITTER_EXIT_DIRECTIONS}
+        exit_segments = {
+            (cell, direction): self.walk_segment(x=cell % self.width, y=cell // self.width, direction=direction)
+            for cell, directions in splitter_exits.items() for direction in directions
+        }
+        # splitters can hit each other in loops: propagate the reach up to the fixed point
+        splitter_reach = {cell: 0 for cell in splitter_exits}
+        changed = True
+        while changed:
+            changed = False
+            for cell, directions in splitter_exits.items():
+                reach = splitter_reach[cell]
+                for direction in directions:
+                    energized, end_splitter = exit_segments[(cell, direction)]
+                    reach |= energized
+                    if end_splitter is not None:
+                        reach |= splitter_reach[end_splitter]
+                if reach != splitter_reach[cell]:
+                    splitter_reach[cell] = reach
+                    changed = True
+        return {
+            (cell, direction): energized | (splitter_reach[end_splitter] if end_splitter is not None else 0)
+            for (cell, direction), (energized, end_splitter) in exit_segments.items()
+        }
+
+    def get_n_energized_tiles_cached(self, edge_position: Position, vector: Vector) -> int:
+        splitter_exit_reach = self.splitter_exit_reach
+        start_cell = edge_position.y*self.width + edge_position.x
+        energized = 0
+        for direction in NEXT_DIRECTIONS[self.cells[start_cell]][VECTOR_DIRECTION_CODES[vector]]:
+            if (start_cell, direction) in splitter_exit_reach:
+                energized |= splitter_exit_reach[(start_cell, direction)]
+                continue
+            walked, end_splitter = self.walk_segment(x=edge_position.x, y=edge_position.y, direction=direction)
+            energized |= walked
+            if end_splitter is not None:
+                for end_direction in SPLITTER_EXIT_DIRECTIONS[self.cells[end_splitter]]:
+                    energized |= splitter_exit_reach[(end_splitter, end_direction)]
+        return bin(energized).count('1')
+
+    def get_max_energized_from_edges(self, edge_positions_and_vectors: List[Tuple[Position, Vector]]) -> Tuple[int, Optional[Tuple[Position, Vector]]]:
+        max_energized_tiles = 0
+        start_point_max_energy = None
+        for edge_position, vector in edge_positions_and_vectors:
+            n_energy_try = self.get_n_energized_tiles_cached(edge_position=edge_position, vector=vector)
+            if n_energy_try > max_energized_tiles:
+                max_energized_tiles = n_energy_try
+                start_point_max_energy = (edge_position, vector)
+        return max_energized_tiles, start_point_max_energy
+
+    def max_energized(self, workers: int = 1) -> Tuple[int, Optional[Tuple[Position, Vector]]]:
+        """Max energized tiles over all the edge starts, and the start reaching it. Edge starts are spread over workers processes"""
+        # built once here, so every worker gets the splitter cache along with the map
+        self.splitter_exit_reach
+        edge_positions_and_vectors = self.get_edge_positions_and_vectors()
+        if workers <= 1:
+            return self.get_max_energized_from_edges(edge_positions_and_vectors=edge_positions_and_vectors)
+        chunks = [edge_positions_and_vectors[i::workers] for i in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(CompiledMirrorMap.get_max_energized_from_edges, [self]*workers, chunks))
+        return max(results, key=lambda result: result[0])
+
 if __name__ == '__main__':
     test_mirror_map_lines = [
         '.|...$....',
@@ -240,6 +396,8 @@ if __name__ == '__main__':
     print('')
     test_mirror_map.print_beam_flow()
     print('')
+    test_compiled_mirror_map = CompiledMirrorMap.from_mirror_map(mirror_map=test_mirror_map)
+    print(f'Test map energized tiles with compiled engine are {test_compiled_mirror_map.get_n_energized_tiles(edge_position=Position(x=0, y=0), vector=V_E)}')
 
     with open('.\mirror_map.txt', "r") as fr:
         mirror_map = MirrorMap.from_description(map_line_descriptions=[line.rstrip() for line in fr])
@@ -279,3 +437,6 @@ if __name__ == '__main__':
             max_energied_tiles = n_energy_try
             start_point_max_energy = edge_pos_vector
     print(f'Map energized tiles max is {max_energied_tiles}, starting from edge point {start_point_max_energy}')
+
+    max_energied_tiles, start_point_max_energy = CompiledMirrorMap.from_mirror_map(mirror_map=mirror_map).max_energized(workers=4)
+    print(f'Map energized tiles max with compiled engine is {max_energied_tiles}, starting from edge point {start_point_max_energy}')
@@ -1,5 +1,5 @@
-from typing import List, Dict, Tuple, Set, Iterable
-from dataclasses import dataclass
+from typing import List, Dict, Tuple, Set, Iterable, Optional, Callable
+from dataclasses import dataclass, replace
 import itertools as it
 
 MAJOR = '>'
@@ -12,6 +12,8 @@ ELEMENT_X = 'x'
 ELEMENT_M = 'm'
 ELEMENT_A = 'a'
 ELEMENT_S = 's'
+# ratings as plain tuples, for the compiled machine
+ELEMENT_INDEXES = {ELEMENT_X: 0, ELEMENT_M: 1, ELEMENT_A: 2, ELEMENT_S: 3}
 
 
 @dataclass(frozen=True)
@@ -51,6 +53,11 @@ class Part:
             part_dictionary[element_info[0]] = int(element_info[1])
         return Part.from_dictionary(part_dictionary=part_dictionary)
 
+    @staticmethod
+    def ratings_from_string(description: str) -> Tuple[int, int, int, int]:
+        """'{x=787,m=2655,a=1222,s=2876}' -> (787, 2655, 1222, 2876), assuming x, m, a, s order"""
+        return tuple(int(element[2:]) for element in description.rstrip().removeprefix('{').removesuffix('}').split(','))
+
 @dataclass(frozen=True)
 class PartSet:
 
@@ -81,6 +88,19 @@ class PartSet:
             n *= self.get_delta_interval(element=element)
         return n
 
+    @staticmethod
+    def full_set(max_value: int=4000) -> 'PartSet':
+        return PartSet(x_interval=(1, max_value), m_interval=(1, max_value), a_interval=(1, max_value), s_interval=(1, max_value))
+
+    def get_interval(self, element: str) -> Tuple[int, int]:
+        return getattr(self, f'{element}_interval')
+
+    def get_part_set_with_interval(self, element: str, interval: Tuple[int, int]) -> Optional['PartSet']:
+        """Same set with the element interval replaced, None if the interval is empty"""
+        if interval[0] > interval[1]:
+            return None
+        return replace(self, **{f'{element}_interval': interval})
+
 
 @dataclass(frozen=True)
 class Rule:
@@ -108,9 +128,21 @@ class Rule:
 
     def do_part_pass(self, part: Part) -> bool:
         if self.comparer == MAJOR:
-            return part.full_dict[self.parameter] > self.value
+            return getattr(part, self.parameter) > self.value
         if self.comparer == MINOR:
-            return part.full_dict[self.parameter] < self.value
+            return getattr(part, self.parameter) < self.value
+
+    def split_part_set(self, part_set: PartSet) -> Tuple[Optional[PartSet], Optional[PartSet]]:
+        """(parts passing the rule, parts failing it), None when empty"""
+        start, end = part_set.get_interval(element=self.parameter)
+        if self.comparer == MAJOR:
+            pass_interval, fail_interval = (max(start, self.value + 1), end), (start, min(end, self.value))
+        else:
+            pass_interval, fail_interval = (start, min(end, self.value - 1)), (max(start, self.value), end)
+        return (
+            part_set.get_part_set_with_interval(element=self.parameter, interval=pass_interval),
+            part_set.get_part_set_with_interval(element=self.parameter, interval=fail_interval),
+        )
 
 
 @dataclass(frozen=True)
@@ -186,6 +218,61 @@ class WorkMachine:
                     for s_interval in s_intervals:
                         yield PartSet(x_interval=x_interval, m_interval=m_interval, a_interval=a_interval, s_interval=s_interval)
         # return {PartSet(x_interval=interval_combo[0], m_interval=interval_combo[1], a_interval=interval_combo[2], s_interval=interval_combo[3]) for interval_combo in it.product(x_intervals, m_intervals, a_intervals, s_intervals)}  # is a generator but still slow as hell!
+
+    def compile(self) -> Callable[[Tuple[int, int, int, int]], bool]:
+        """Accept check over ratings tuples: every workflow becomes a chain of closures already bound to its target closures"""
+        workflows_by_id = {workflow.id: workflow for workflow in self.workflows}
+        compiled = {PART_ACCEPTED: lambda ratings: True, PART_REJECTED: lambda ratings: False}
+
+        def make_rule_check(index: int, comparer: str, value: int, pass_check: Callable, fail_check: Callable) -> Callable:
+            if comparer == MAJOR:
+                return lambda ratings: pass_check(ratings) if ratings[index] > value else fail_check(ratings)
+            return lambda ratings: pass_check(ratings) if ratings[index] < value else fail_check(ratings)
+
+        def compile_workflow(wf_id: str) -> Callable:
+            if wf_id not in compiled:
+                workflow = workflows_by_id[wf_id]
+                check = compile_workflow(workflow.id_wf_otherwise_output)
+                for rule in reversed(workflow.rules):
+                    check = make_rule_check(ELEMENT_INDEXES[rule.parameter], rule.comparer, rule.value, compile_workflow(rule.id_rule_output), check)
+                compiled[wf_id] = check
+            return compiled[wf_id]
+
+        return compile_workflow(START_WORKFLOW_ID)
+
+    def score_parts(self, part_descriptions: Iterable[str], batch_size: int=65536) -> int:
+        """Tot rating of the accepted parts, read in batches from any iterable of part lines (an open file too)"""
+        is_accepted = self.compile()
+        tot_rating = 0
+        part_descriptions = iter(part_descriptions)
+        while True:
+            batch = [Part.ratings_from_string(description) for description in it.islice(part_descriptions, batch_size) if len(description) > 1]
+            if not batch:
+                return tot_rating
+            tot_rating += sum(sum(ratings) for ratings in batch if is_accepted(ratings))
+
+    def get_n_accepted_parts(self, max_value: int=4000) -> int:
+        """Push the full hyper-rectangle from 'in' through the rules, splitting on each comparison, and sum what reaches 'A'"""
+        workflows_by_id = {workflow.id: workflow for workflow in self.workflows}
+        n_accepted_parts = 0
+        pending = [(START_WORKFLOW_ID, PartSet.full_set(max_value=max_value))]
+        while pending:
+            wf_id, part_set = pending.pop()
+            if wf_id == PART_ACCEPTED:
+                n_accepted_parts += part_set.n_set_parts
+                continue
+            if wf_id == PART_REJECTED:
+                continue
+            workflow = workflows_by_id[wf_id]
+            for rule in workflow.rules:
+                passing_set, part_set = rule.split_part_set(part_set=part_set)
+                if passing_set is not None:
+                    pending.append((rule.id_rule_output, passing_set))
+                if part_set is None:
+                    break
+            else:
+                pending.append((workflow.id_wf_otherwise_output, part_set))
+        return n_accepted_parts
             
 
 if __name__ == '__main__':
@@ -229,6 +316,7 @@ if __name__ == '__main__':
     for part in test_parts:
         print(f'part {part} accepted: {test_wf_machine.is_part_accepted(part=part)}')
     print(f'Test workflow tot rating is {sum([part.tot_rating for part in test_parts if test_wf_machine.is_part_accepted(part=part)])}')
+    print(f'Test workflow tot rating with compiled machine is {test_wf_machine.score_parts(test_part_descriptions)}')
     # real part 1
     workflow_machine_collect = True
     workflows = []
@@ -256,6 +344,9 @@ if __name__ == '__main__':
         if test_wf_machine.is_part_accepted(part=set_part.part_delegate):
             test_n_accepted_parts += set_part.n_set_parts
     print(f'Test workflow distinct combo accepted are {test_n_accepted_parts}')
+    assert test_wf_machine.get_n_accepted_parts() == 167409079868000
+    print(f'Test workflow distinct combo accepted with range splitting are {test_wf_machine.get_n_accepted_parts()}')
+    print(f'Workflow distinct combo accepted with range splitting are {wf_machine.get_n_accepted_parts()}')
     # real part 2
     n_accepted_parts = 0
     repr_set_parts = wf_machine.get_part_representative_sets()
@@ -1,5 +1,7 @@
-from typing import Tuple, List, Dict, Iterable
+from typing import Tuple, List, Dict, Iterable, Optional
 from dataclasses import dataclass, field
+from collections import deque
+from math import gcd
 
 BROADCASTER = 'broadcaster'
 FLIP_FLOP = '%'
@@ -8,6 +10,12 @@ CONJUNCTION = '&'
 STATE_ON = 'on'
 STATE_OFF = 'off'
 
+# module kinds for the compiled machine
+KIND_BROADCASTER = 0
+KIND_FLIP_FLOP = 1
+KIND_CONJUNCTION = 2
+KIND_OUTPUT = 3  # ids only named as destination (e.g. rx), pulses end there
+
 
 @dataclass(frozen=True)
 class Pulse:
@@ -123,6 +131,21 @@ class ModuleBroadcaster(Module):
         return self.sent_pulses(pulse=pulse_source.pulse)
 
 
+def combine_congruences(congruences: List[Tuple[int, int]]) -> Optional[Tuple[int, int]]:
+    """Generalised CRT: [(offset, period), ...] -> (offset, lcm of periods) of the n satisfying all of them, None if none does"""
+    offset, period = 0, 1
+    for other_offset, other_period in congruences:
+        g = gcd(period, other_period)
+        if (other_offset - offset) % g != 0:
+            return None
+        # offset + period*k = other_offset (mod other_period)
+        k = ((other_offset - offset) // g) * pow(period // g, -1, other_period // g) % (other_period // g)
+        offset += period*k
+        period = period // g * other_period
+        offset %= period
+    return offset, period
+
+
 def get_module_from_description(description: str) -> Module:
     description = description.rstrip().replace(' ', '')
     mod_info = description.split('->')
@@ -213,6 +236,193 @@ class PulseMachine:
         for module in self.modules:
             module.reset_status()
 
+    def predict_presses_until(self, module: str = 'rx', pulse: Pulse = PULSE_LOW, max_presses: int = 1000000) -> Optional[int]:
+        """
+        Presses needed to get pulse into module, from the reset state. When module is fed by a single conjunction (and pulse is low),
+        records first high pulse press and period of every conjunction input and combines them with CRT/LCM.
+        Falls back to plain simulation if the inputs are not periodic within max_presses, None if even that does not reach it.
+        """
+        compiled = self.compile()
+        target = compiled.get_module_index(id=module)
+        feeders = [src for src, outs in enumerate(compiled.outputs) if any(out_tgt == target for out_tgt, _ in outs)]
+        feeder_inputs = []
+        if pulse == PULSE_LOW and len(feeders) == 1 and compiled.kinds[feeders[0]] == KIND_CONJUNCTION:
+            feeder_inputs = [src for src, outs in enumerate(compiled.outputs) if any(out_tgt == feeders[0] for out_tgt, _ in outs)]
+        # a conjunction without inputs has nothing to combine, simulation only
+        if feeder_inputs:
+            feeder = feeders[0]
+            # press numbers of the first 3 high pulses of every input, enough to check the period
+            high_presses: Dict[int, List[int]] = {src: [] for src in feeder_inputs}
+            button_press_count = 0
+            while button_press_count < max_presses and any(len(presses) < 3 for presses in high_presses.values()):
+                button_press_count += 1
+                states_before_press = list(compiled.states)
+                senders = set(compiled.push_button(start_pulse=PULSE_LOW, watch_module=feeder, watch_pulse=PULSE_HIGH))
+                if senders.issuperset(feeder_inputs):
+                    # every input went high in this press, but maybe not at the same time: replay it watching the target
+                    compiled.states = states_before_press
+                    if compiled.push_button(start_pulse=PULSE_LOW, watch_module=target, watch_pulse=pulse):
+                        return button_press_count
+                for src in senders:
+                    # faster inputs stop at 3 presses while waiting for the slower ones
+                    if len(high_presses[src]) < 3:
+                        high_presses[src].append(button_press_count)
+            periods_found = all(len(presses) == 3 and presses[2] - presses[1] == presses[1] - presses[0] for presses in high_presses.values())
+            if periods_found:
+                combined = combine_congruences([(presses[0], presses[1] - presses[0]) for presses in high_presses.values()])
+                if combined is not None:
+                    button_press_count, period = combined
+                    first_press = max(presses[0] for presses in high_presses.values())
+                    if button_press_count < first_press:
+                        button_press_count += period*((first_press - button_press_count + period - 1) // period)
+                    return button_press_count
+            print(f'conjunction {compiled.module_ids[feeder]} inputs are not periodic, falling back to simulation')
+        compiled.reset()
+        for button_press_count in range(1, max_presses + 1):
+            if compiled.push_button(start_pulse=PULSE_LOW, watch_module=target, watch_pulse=pulse):
+                return button_press_count
+        return None
+
+    def compile(self) -> 'CompiledPulseMachine':
+        """Integer module ids, adjacency arrays and conjunction memories as bitmasks, starting from the reset state"""
+        module_ids = [module.id for module in self.modules]
+        module_ids.extend(sorted({out_id for module in self.modules for out_id in module.out_ids_connected} - set(module_ids)))
+        indexes = {module_id: i for i, module_id in enumerate(module_ids)}
+        kinds = [KIND_OUTPUT]*len(module_ids)
+        for module in self.modules:
+            if isinstance(module, ModuleBroadcaster):
+                kinds[indexes[module.id]] = KIND_BROADCASTER
+            elif isinstance(module, ModuleFlipFlop):
+                kinds[indexes[module.id]] = KIND_FLIP_FLOP
+            elif isinstance(module, ModuleConjunction):
+                kinds[indexes[module.id]] = KIND_CONJUNCTION
+        # every (src -> conjunction) connection gets its own bit into the conjunction memory
+        memory_bits = {}
+        full_memories = [0]*len(module_ids)
+        for module in self.modules:
+            for out_id in module.out_ids_connected:
+                tgt = indexes[out_id]
+                if kinds[tgt] == KIND_CONJUNCTION:
+                    memory_bits[(indexes[module.id], tgt)] = full_memories[tgt] + 1
+                    full_memories[tgt] = (full_memories[tgt] << 1) | 1
+        outputs = [()]*len(module_ids)
+        for module in self.modules:
+            src = indexes[module.id]
+            outputs[src] = tuple((indexes[out_id], memory_bits.get((src, indexes[out_id]), 0)) for out_id in module.out_ids_connected)
+        return CompiledPulseMachine(
+            module_ids=module_ids,
+            kinds=kinds,
+            outputs=outputs,
+            full_memories=full_memories,
+            broadcaster=indexes[BROADCASTER],
+        )
+
+
+@dataclass
+class CompiledPulseMachine:
+
+    module_ids: List[str]
+    kinds: List[int]
+    outputs: List[Tuple[Tuple[int, int]]]  # per module, (tgt module, bit set into the tgt memory)
+    full_memories: List[int]
+    broadcaster: int
+    states: List[int] = field(default_factory=list)  # flip flop on/off as 1/0, conjunction memory bitmask of the high inputs
+    n_pulses_high: int = 0
+    n_pulses_low: int = 0
+
+    def __post_init__(self):
+        if not self.states:
+            self.states = [0]*len(self.module_ids)
+
+    def get_module_index(self, id: str) -> int:
+        return self.module_ids.index(id)
+
+    def push_button(self, start_pulse: Pulse = PULSE_LOW, watch_module: int = -1, watch_pulse: Pulse = PULSE_LOW) -> List[int]:
+        """One press; returns the modules that sent watch_pulse to watch_module during it (none watched by default)"""
+        kinds, outputs, full_memories, states = self.kinds, self.outputs, self.full_memories, self.states
+        watch_high = watch_pulse == PULSE_HIGH
+        watched_senders = []
+        n_pulses_high = 0
+        n_pulses_low = 0
+        queue = deque([(self.broadcaster, 0, start_pulse == PULSE_HIGH)])
+        while queue:
+            tgt, memory_bit, is_high = queue.popleft()
+            if is_high:
+                n_pulses_high += 1
+            else:
+                n_pulses_low += 1
+            kind = kinds[tgt]
+            if kind == KIND_FLIP_FLOP:
+                if is_high:
+                    continue
+                states[tgt] ^= 1
+                is_high = states[tgt] == 1
+            elif kind == KIND_CONJUNCTION:
+                if is_high:
+                    states[tgt] |= memory_bit
+                else:
+                    states[tgt] &= ~memory_bit
+                is_high = states[tgt] != full_memories[tgt]
+            elif kind == KIND_OUTPUT:
+                continue
+            for out_tgt, out_memory_bit in outputs[tgt]:
+                if out_tgt == watch_module and is_high == watch_high:
+                    watched_senders.append(tgt)
+                queue.append((out_tgt, out_memory_bit, is_high))
+        self.n_pulses_high += n_pulses_high
+        self.n_pulses_low += n_pulses_low
+        return watched_senders
+
+    @property
+    def state_widths(self) -> List[int]:
+        return [1 if kind == KIND_FLIP_FLOP else full_memory.bit_length() for kind, full_memory in zip(self.kinds, self.full_memories)]
+
+    @property
+    def state_fingerprint(self) -> int:
+        """All flip flop bits and conjunction memories packed in a single int"""
+        fingerprint = 0
+        for state, width in zip(self.states, self.state_widths):
+            fingerprint = (fingerprint << width) | state
+        return fingerprint
+
+    def set_state_fingerprint(self, fingerprint: int) -> None:
+        for i, width in reversed(list(enumerate(self.state_widths))):
+            self.states[i] = fingerprint & ((1 << width) - 1)
+            fingerprint >>= width
+
+    def push_button_n_times(self, start_pulse: Pulse, n_push: int, fast_forward: bool = False) -> None:
+        """
+        With fast_forward, the state is fingerprinted after each press: at the first repeat the counters are
+        extrapolated over the remaining presses, in time proportional to the cycle length.
+        """
+        if not fast_forward:
+            for _ in range(n_push):
+                self.push_button(start_pulse=start_pulse)
+            return
+        seen_fingerprints = {self.state_fingerprint: 0}
+        # after i presses: fingerprint, n pulses low, n pulses high
+        history = [(self.state_fingerprint, self.n_pulses_low, self.n_pulses_high)]
+        for i in range(1, n_push + 1):
+            self.push_button(start_pulse=start_pulse)
+            fingerprint = self.state_fingerprint
+            if fingerprint in seen_fingerprints:
+                cycle_start = seen_fingerprints[fingerprint]
+                cycle_length = i - cycle_start
+                n_cycles, n_push_left = divmod(n_push - i, cycle_length)
+                _, cycle_start_low, cycle_start_high = history[cycle_start]
+                end_fingerprint, end_low, end_high = history[cycle_start + n_push_left]
+                self.n_pulses_low += n_cycles*(self.n_pulses_low - cycle_start_low) + (end_low - cycle_start_low)
+                self.n_pulses_high += n_cycles*(self.n_pulses_high - cycle_start_high) + (end_high - cycle_start_high)
+                self.set_state_fingerprint(fingerprint=end_fingerprint)
+                return
+            seen_fingerprints[fingerprint] = i
+            history.append((fingerprint, self.n_pulses_low, self.n_pulses_high))
+
+    def reset(self) -> None:
+        self.n_pulses_high = 0
+        self.n_pulses_low = 0
+        self.states = [0]*len(self.module_ids)
+
 if __name__  == '__main__':
     print(get_module_from_description(description='broadcaster -> a, b, c'))
     print(get_module_from_description(description='%a -> b'))
@@ -241,11 +451,41 @@ if __name__  == '__main__':
     test_pm2.reset()
     test_pm2.push_button_n_times(start_pulse=PULSE_LOW, n_push=1000)
     print(f'test pm2 after 1000 push n pulses low are {test_pm2.n_pulses_low}, n pulses high are {test_pm2.n_pulses_high}, hence product result is {test_pm2.n_pulses_low * test_pm2.n_pulses_high}')
+    test_pm2_compiled = test_pm2.compile()
+    test_pm2_compiled.push_button_n_times(start_pulse=PULSE_LOW, n_push=1000)
+    assert (test_pm2_compiled.n_pulses_low, test_pm2_compiled.n_pulses_high) == (test_pm2.n_pulses_low, test_pm2.n_pulses_high)
+    test_pm2_compiled.reset()
+    test_pm2_compiled.push_button_n_times(start_pulse=PULSE_LOW, n_push=10**12, fast_forward=True)
+    print(f'test pm2 after 10^12 push n pulses low are {test_pm2_compiled.n_pulses_low}, n pulses high are {test_pm2_compiled.n_pulses_high}')
+    # two counters resetting every 7 and 11 presses, each through an inverter into the rx feeder
+    test_pm3_descr = [
+        'broadcaster -> a0, b0',
+        '%a0 -> a1, ca',
+        '%a1 -> a2, ca',
+        '%a2 -> ca',
+        '&ca -> a0, ia',
+        '&ia -> feed',
+        '%b0 -> b1, cb',
+        '%b1 -> b2, cb',
+        '%b2 -> b3',
+        '%b3 -> cb',
+        '&cb -> b0, b2, ib',
+        '&ib -> feed',
+        '&feed -> rx',
+    ]
+    test_pm3 = PulseMachine.from_mod_descriptions(mod_descriptions=test_pm3_descr)
+    test_pm3_presses = test_pm3.predict_presses_until(module='rx', pulse=PULSE_LOW, max_presses=50)
+    print(f'test pm3 low pulse reaches rx module after {test_pm3_presses} button pushes')
+    assert test_pm3_presses == 77
 
     with open('.\modules.txt', "r") as fr:
         pm = PulseMachine.from_mod_descriptions(mod_descriptions=[line for line in fr])
     pm.push_button_n_times(start_pulse=PULSE_LOW, n_push=1000)
     print(f'Pm after 1000 push n pulses low are {pm.n_pulses_low}, n pulses high are {pm.n_pulses_high}, hence product result is {pm.n_pulses_low * pm.n_pulses_high}')
+    pm_compiled = pm.compile()
+    pm_compiled.push_button_n_times(start_pulse=PULSE_LOW, n_push=1000)
+    print(f'Compiled pm after 1000 push n pulses low are {pm_compiled.n_pulses_low}, n pulses high are {pm_compiled.n_pulses_high}')
+    print(f'At least a low pulse reaches rx module after {pm.predict_presses_until(module="rx", pulse=PULSE_LOW)} button pushes')
     # slow, doesn't reach end
     pm.reset()
     button_press_count = 0
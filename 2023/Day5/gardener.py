@@ -1,6 +1,8 @@
-from typing import List, Dict, Tuple, Iterable
+from typing import List, Dict, Tuple, Iterable, Optional
 from dataclasses import dataclass
+from bisect import bisect_right
 import itertools
+import numpy as np
 
 @dataclass
 class GardenElement:
@@ -32,6 +34,12 @@ class GardenElement:
         for explosion in range(number_explosions):
             yield self.position + explosion
 
+    @staticmethod
+    def get_seed_ranges_from_line(elements_line: str) -> List[Tuple[int, int]]:
+        """seeds: 79 14 55 13 -> [(79, 14), (55, 13)], as (start, length) without exploding anything"""
+        starting_positions = [int(pos) for pos in elements_line.removeprefix('seeds:').split()]
+        return [(starting_positions[i], starting_positions[i + 1]) for i in range(0, len(starting_positions), 2)]
+
 @dataclass
 class InOutMapper:
 
@@ -66,6 +74,20 @@ class InOutMapper:
     def source_border_points(self) -> List[int]:
         return [self.source_range_start, self.source_range_end - 1]
 
+    def split_source_range(self, range_start: int, range_length: int) -> Tuple[Optional[Tuple[int, int]], List[Tuple[int, int]]]:
+        """Split (start, length) at the mapper borders: (mapped destination range or None, source leftovers outside the mapper)"""
+        range_end = range_start + range_length
+        overlap_start = max(range_start, self.source_range_start)
+        overlap_end = min(range_end, self.source_range_end)
+        if overlap_start >= overlap_end:
+            return None, [(range_start, range_length)]
+        leftovers = []
+        if range_start < overlap_start:
+            leftovers.append((range_start, overlap_start - range_start))
+        if overlap_end < range_end:
+            leftovers.append((overlap_end, range_end - overlap_end))
+        return (self.get_destination_position(source_position=overlap_start), overlap_end - overlap_start), leftovers
+
 @dataclass
 class SourceDestinationMapper:
     
@@ -93,6 +115,37 @@ class SourceDestinationMapper:
                 # return in_out.mapping_source_to_destination[source_position]
         return source_position
 
+    def map_source_ranges_to_destination(self, source_ranges: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """Push (start, length) intervals through the layer, splitting them at every InOutMapper border"""
+        pending = list(source_ranges)
+        destination_ranges = []
+        for in_out in self.mappers:
+            not_mapped = []
+            for range_start, range_length in pending:
+                mapped, leftovers = in_out.split_source_range(range_start=range_start, range_length=range_length)
+                if mapped is not None:
+                    destination_ranges.append(mapped)
+                not_mapped.extend(leftovers)
+            pending = not_mapped
+        # whatever no mapper catches keeps its position
+        destination_ranges.extend(pending)
+        return destination_ranges
+
+    def get_breakpoint_table(self) -> Tuple[List[int], List[int]]:
+        """Layer as piecewise-linear function over [0, inf): sorted segment starts and the offset applied on each segment"""
+        breakpoints = [0]
+        offsets = [0]
+        for in_out in sorted(self.mappers, key=lambda in_out: in_out.source_range_start):
+            if in_out.source_range_start > breakpoints[-1]:
+                breakpoints.append(in_out.source_range_start)
+                offsets.append(in_out.destination_range_start - in_out.source_range_start)
+            else:
+                # mapper starting at 0 or right where the previous one ends
+                offsets[-1] = in_out.destination_range_start - in_out.source_range_start
+            breakpoints.append(in_out.source_range_end)
+            offsets.append(0)
+        return breakpoints, offsets
+
     @property
     def layer_source_border_points(self) -> List[int]:
         return list(itertools.chain.from_iterable([mapper.source_border_points for mapper in self.mappers]))
@@ -122,6 +175,40 @@ class SeedAlmanac:
             position = reached_position_step
         return reached_position_step
 
+    def map_seed_ranges_to_location_ranges(self, seed_ranges: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        ranges = list(seed_ranges)
+        for layer_mapper in self.layer_mappers:
+            ranges = layer_mapper.map_source_ranges_to_destination(source_ranges=ranges)
+        return ranges
+
+    def get_min_location_from_seed_ranges(self, seed_ranges: Iterable[Tuple[int, int]]) -> int:
+        """Range propagation mode: no seed is enumerated, work scales with the number of mapper rows"""
+        return min(range_start for range_start, range_length in self.map_seed_ranges_to_location_ranges(seed_ranges=seed_ranges) if range_length > 0)
+
+    def compile(self) -> 'CompiledAlmanac':
+        """Merge all the layers into a single sorted table of breakpoints, seed -> location"""
+        breakpoints = [0]
+        offsets = [0]
+        for layer_mapper in self.layer_mappers:
+            layer_breakpoints, layer_offsets = layer_mapper.get_breakpoint_table()
+            composed_breakpoints = []
+            composed_offsets = []
+            for i, (segment_start, offset) in enumerate(zip(breakpoints, offsets)):
+                # image of the segment in the layer source space, split at the layer breakpoints
+                image_start = segment_start + offset
+                image_end = breakpoints[i + 1] + offset if i + 1 < len(breakpoints) else None
+                j = bisect_right(layer_breakpoints, image_start) - 1
+                piece_start = image_start
+                while True:
+                    composed_breakpoints.append(piece_start - offset)
+                    composed_offsets.append(offset + layer_offsets[j])
+                    j += 1
+                    if j == len(layer_breakpoints) or (image_end is not None and layer_breakpoints[j] >= image_end):
+                        break
+                    piece_start = layer_breakpoints[j]
+            breakpoints, offsets = CompiledAlmanac.merge_segments(breakpoints=composed_breakpoints, offsets=composed_offsets)
+        return CompiledAlmanac(breakpoints=breakpoints, offsets=offsets)
+
     @property
     def almanac_source_border_points(self) -> List[int]:
         return list(itertools.chain.from_iterable([mapper.layer_source_border_points for mapper in self.layer_mappers]))
@@ -145,6 +232,35 @@ class SeedAlmanac:
             ) for border_interval in self.get_seed_falling_possibility_intervals(end_border=end_border)
         ]
 
+@dataclass
+class CompiledAlmanac:
+
+    breakpoints: List[int]
+    offsets: List[int]
+
+    def __post_init__(self):
+        self.np_breakpoints = np.array(self.breakpoints, dtype=np.int64)
+        self.np_offsets = np.array(self.offsets, dtype=np.int64)
+
+    @staticmethod
+    def merge_segments(breakpoints: List[int], offsets: List[int]) -> Tuple[List[int], List[int]]:
+        """Drop consecutive segments sharing the same offset"""
+        merged_breakpoints = [breakpoints[0]]
+        merged_offsets = [offsets[0]]
+        for breakpoint, offset in zip(breakpoints[1:], offsets[1:]):
+            if offset == merged_offsets[-1]:
+                continue
+            merged_breakpoints.append(breakpoint)
+            merged_offsets.append(offset)
+        return merged_breakpoints, merged_offsets
+
+    def map_seed_to_location_position(self, seed_starting_position: int) -> int:
+        return seed_starting_position + self.offsets[bisect_right(self.breakpoints, seed_starting_position) - 1]
+
+    def map_seeds_to_locations(self, seed_positions: np.ndarray) -> np.ndarray:
+        seed_positions = np.asarray(seed_positions, dtype=np.int64)
+        return seed_positions + self.np_offsets[np.searchsorted(self.np_breakpoints, seed_positions, side='right') - 1]
+
 if __name__ == '__main__':
     # el =  GardenElement(layer='seed', position=39)
     # for el in el.get_exploded_elements(number_explosions=10):
@@ -205,6 +321,7 @@ if __name__ == '__main__':
         if i == 0:
             test_elements = GardenElement.get_elements_from_line(elements_line=line)
             test_elements_exploded = GardenElement.get_exploded_elements_from_line(elements_line=line)
+            test_seed_ranges = GardenElement.get_seed_ranges_from_line(elements_line=line)
             continue
         if len(line) <= 1:
             if test_sd_identifiers_description is not None:
@@ -223,6 +340,9 @@ if __name__ == '__main__':
     # print(test_elements)
     # print(test_elements_exploded)
     test_almanac = SeedAlmanac(layer_mappers=test_layer_mappers)
+    print(f'test result lowest location number from seed ranges is {test_almanac.get_min_location_from_seed_ranges(seed_ranges=test_seed_ranges)}')
+    test_compiled_almanac = test_almanac.compile()
+    print(f'test result lowest location number from compiled almanac is {test_compiled_almanac.map_seeds_to_locations(np.array([el.position for el in test_elements])).min()}')
     # print(test_almanac.almanac_source_border_points)
     # print(test_almanac.get_seed_falling_possibility_intervals(end_border=101))
     # print(test_almanac.map_seed_to_location_position(14))
@@ -304,3 +424,7 @@ if __name__ == '__main__':
     #     base_seed_processed += 1
         
     # print(f'result lowest location number after seed explosion is {min_location_exploded}')
+
+    # with open("seed_mapping.txt", "r") as fr:
+    #     seed_ranges = GardenElement.get_seed_ranges_from_line(elements_line=fr.readline())
+    # print(f'result lowest location number from seed ranges is {almanac.get_min_location_from_seed_ranges(seed_ranges=seed_ranges)}')
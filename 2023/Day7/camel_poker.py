@@ -1,9 +1,13 @@
-from typing import List
+from typing import List, Tuple
 from dataclasses import dataclass
 from collections import Counter
+from functools import cached_property
+import numpy as np
 
 # parsing game, J can be joker, that is %
 CARD_VALUE_ORDER = 'AKQJT98765432%'
+# packed sort key: hand value, then card values as base 15 digits
+SORT_KEY_BASE = 15
 
 @dataclass(frozen=True)
 class Card:
@@ -35,6 +39,19 @@ class HandValue:
     four_of_a_kind: int = 6
     five_of_a_kind: int = 7
 
+    @staticmethod
+    def from_sorted_counts(sorted_counts: List[int]) -> int:
+        """Hand value from the counts of each kind, descending, jokers already added to the first one"""
+        if sorted_counts[0] == 5:
+            return HandValue.five_of_a_kind
+        if sorted_counts[0] == 4:
+            return HandValue.four_of_a_kind
+        if sorted_counts[0] == 3:
+            return HandValue.full_house if sorted_counts[1] == 2 else HandValue.three_of_a_kind
+        if sorted_counts[0] == 2:
+            return HandValue.two_pair if sorted_counts[1] == 2 else HandValue.pair
+        return HandValue.high_card
+
 
 @dataclass
 class CardHand:
@@ -108,6 +125,16 @@ class CardHand:
             return HandValue.pair
         return HandValue.high_card
 
+    @cached_property
+    def sort_key(self) -> int:
+        """Hand classified once, jokers joining the most frequent kind, packed with the card values in a single int"""
+        sorted_counts = sorted(self.hand_counter_of_each_kind_joker_excluded.values(), reverse=True) or [0]
+        sorted_counts[0] += self.number_of_jokers
+        sort_key = HandValue.from_sorted_counts(sorted_counts=sorted_counts)
+        for card in self.cards:
+            sort_key = sort_key*SORT_KEY_BASE + card.card_value
+        return sort_key
+
     def __gt__(self, obj: object) -> bool:
         if isinstance(obj, CardHand):
             if self.get_hand_combo_value() != obj.get_hand_combo_value():
@@ -124,17 +151,125 @@ class FullGame:
     hands: List[CardHand]
     _is_sorted: bool =  False
     
-    def sort_hands(self) -> None:
+    def sort_hands(self, use_numpy: bool = False) -> None:
         if self._is_sorted:
             print('Already sorted, no need to sort again')
             return
-        self.hands.sort()
+        if use_numpy:
+            sort_keys = np.fromiter((card_hand.sort_key for card_hand in self.hands), dtype=np.int64, count=len(self.hands))
+            self.hands = [self.hands[i] for i in np.argsort(sort_keys, kind='stable')]
+        else:
+            self.hands.sort(key=lambda card_hand: card_hand.sort_key)
         self._is_sorted = True
 
     def get_total_winnings(self) -> int:
         self.sort_hands()
         return sum([(rk + 1) * card_hand.bid for rk, card_hand in enumerate(self.hands)])
 
+@dataclass
+class ColumnarGame:
+
+    cards: np.ndarray  # uint8 card values, one hand per row
+    bids: np.ndarray
+
+    N_CARDS = 5
+
+    @staticmethod
+    def get_card_value_table(joker_game: bool = False) -> np.ndarray:
+        card_value_table = np.zeros(256, dtype=np.uint8)
+        # '%' is only the internal joker id, never read from the input
+        for card_id in CARD_VALUE_ORDER[:-1]:
+            card_value_table[ord(card_id)] = Card(card_id=card_id).card_value
+        if joker_game:
+            card_value_table[ord('J')] = Card(card_id='%').card_value
+        return card_value_table
+
+    @staticmethod
+    def parse_bytes(raw: bytes, joker_game: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """'32T3K 765' lines straight into (cards, bids) arrays, no per card object"""
+        data = np.frombuffer(raw, dtype=np.uint8)
+        line_ends = np.flatnonzero(data == ord('\n'))
+        if len(data) and data[-1] != ord('\n'):
+            line_ends = np.append(line_ends, len(data))
+        line_starts = np.concatenate(([0], line_ends[:-1] + 1))
+        # strip trailing spaces, tabs and carriage returns, then drop empty lines
+        is_trailing_blank = np.zeros(256, dtype=bool)
+        is_trailing_blank[[ord(' '), ord('\t'), ord('\r')]] = True
+        while True:
+            has_trailing_blank = (line_ends > line_starts) & is_trailing_blank[data[np.maximum(line_ends - 1, 0)]]
+            if not has_trailing_blank.any():
+                break
+            line_ends = line_ends - has_trailing_blank
+        not_empty = line_ends > line_starts
+        line_starts, line_ends = line_starts[not_empty], line_ends[not_empty]
+        # 5 cards, a space and at least one bid digit
+        if (line_ends - line_starts < ColumnarGame.N_CARDS + 2).any():
+            raise ValueError('Lines must hold 5 cards, a space and a bid')
+        if (data[line_starts + ColumnarGame.N_CARDS] != ord(' ')).any():
+            raise ValueError('Cards must be followed by a space')
+        cards = ColumnarGame.get_card_value_table(joker_game=joker_game)[data[line_starts[:, None] + np.arange(ColumnarGame.N_CARDS)]]
+        if (cards == 0).any():
+            raise ValueError(f'Cards must be in {CARD_VALUE_ORDER[:-1]}')
+        bid_starts = line_starts + ColumnarGame.N_CARDS + 1
+        bid_lengths = line_ends - bid_starts
+        max_bid_length = int(bid_lengths.max()) if len(bid_lengths) else 0
+        digit_offsets = np.arange(max_bid_length)
+        digit_positions = np.minimum(bid_starts[:, None] + digit_offsets, len(data) - 1)
+        is_bid_digit = digit_offsets < bid_lengths[:, None]
+        digits = np.where(is_bid_digit, data[digit_positions].astype(np.int64) - ord('0'), 0)
+        if ((digits < 0) | (digits > 9)).any() or (bid_lengths < 1).any():
+            raise ValueError('Bids must be made of digits only')
+        powers = np.where(is_bid_digit, 10**np.maximum(bid_lengths[:, None] - 1 - digit_offsets, 0), 0)
+        return cards, (digits*powers).sum(axis=1)
+
+    @staticmethod
+    def from_file(path: str, joker_game: bool = False, chunk_size: int = 1 << 24) -> 'ColumnarGame':
+        """Raw bytes read in chunks cut at the last newline, each chunk parsed as a block"""
+        cards_chunks = []
+        bids_chunks = []
+        leftover = b''
+        with open(path, "rb") as fr:
+            while True:
+                chunk = fr.read(chunk_size)
+                if not chunk:
+                    break
+                chunk = leftover + chunk
+                last_line_end = chunk.rfind(b'\n') + 1
+                chunk, leftover = chunk[:last_line_end], chunk[last_line_end:]
+                if chunk:
+                    cards, bids = ColumnarGame.parse_bytes(raw=chunk, joker_game=joker_game)
+                    cards_chunks.append(cards)
+                    bids_chunks.append(bids)
+        if leftover.strip():
+            cards, bids = ColumnarGame.parse_bytes(raw=leftover, joker_game=joker_game)
+            cards_chunks.append(cards)
+            bids_chunks.append(bids)
+        if not cards_chunks:
+            return ColumnarGame(cards=np.zeros((0, ColumnarGame.N_CARDS), dtype=np.uint8), bids=np.zeros(0, dtype=np.int64))
+        return ColumnarGame(cards=np.concatenate(cards_chunks), bids=np.concatenate(bids_chunks))
+
+    def get_hand_values(self) -> np.ndarray:
+        joker_value = Card(card_id='%').card_value
+        counts = (self.cards[:, :, None] == np.arange(len(CARD_VALUE_ORDER) + 1)).sum(axis=1)
+        n_jokers = counts[:, joker_value].copy()
+        counts[:, joker_value] = 0
+        sorted_counts = -np.sort(-counts, axis=1)
+        first_counts = sorted_counts[:, 0] + n_jokers
+        second_counts = sorted_counts[:, 1]
+        return np.select(
+            [first_counts == 5, first_counts == 4, (first_counts == 3) & (second_counts == 2), first_counts == 3, (first_counts == 2) & (second_counts == 2), first_counts == 2],
+            [HandValue.five_of_a_kind, HandValue.four_of_a_kind, HandValue.full_house, HandValue.three_of_a_kind, HandValue.two_pair, HandValue.pair],
+            default=HandValue.high_card,
+        )
+
+    def get_sort_keys(self) -> np.ndarray:
+        card_weights = SORT_KEY_BASE**np.arange(self.N_CARDS - 1, -1, -1, dtype=np.int64)
+        return self.get_hand_values().astype(np.int64)*SORT_KEY_BASE**self.N_CARDS + self.cards.astype(np.int64) @ card_weights
+
+    def get_total_winnings(self) -> int:
+        order = np.argsort(self.get_sort_keys(), kind='stable')
+        return int((self.bids[order]*np.arange(1, len(order) + 1)).sum())
+
 if __name__ == '__main__':
     # c3 = Card('3')
     # c3b = Card('3')
@@ -191,3 +326,8 @@ if __name__ == '__main__':
     with open(".\hands.txt", "r") as fr:
         game_joker = FullGame(hands=[CardHand.from_line_description(hand_description, joker_game=True) for hand_description in fr])
     print(f'total winnigs considering joker rule are {game_joker.get_total_winnings()}')
+
+    columnar_game = ColumnarGame.from_file(path=".\hands.txt")
+    print(f'total winnigs from columnar game are {columnar_game.get_total_winnings()}')
+    columnar_game_joker = ColumnarGame.from_file(path=".\hands.txt", joker_game=True)
+    print(f'total winnigs from columnar game considering joker rule are {columnar_game_joker.get_total_winnings()}')
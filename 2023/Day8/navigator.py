@@ -1,5 +1,8 @@
-from typing import List, Dict
+from typing import List, Dict, Tuple, Optional
 from dataclasses import dataclass
+from itertools import product
+from math import gcd
+import numpy as np
 
 STARTING_POSITION = 'AAA'
 FINAL_POSITION = 'ZZZ'
@@ -20,6 +23,98 @@ class Coordinate:
         pos_right = lr_elements[1].strip()
         return Coordinate(position=position, pos_left=pos_left, pos_right=pos_right)
 
+@dataclass
+class GhostCycle:
+    """Walk of one ghost: (position, instruction index) states repeat from step offset every cycle_length steps"""
+
+    starting_position: str
+    offset: int
+    cycle_length: int
+    z_hits: List[int]
+
+    @property
+    def transient_z_hits(self) -> List[int]:
+        return [z_hit for z_hit in self.z_hits if z_hit < self.offset]
+
+    @property
+    def cycle_z_hits(self) -> List[int]:
+        return [z_hit for z_hit in self.z_hits if z_hit >= self.offset]
+
+    @property
+    def has_several_z_hits(self) -> bool:
+        return len(self.cycle_z_hits) > 1
+
+    def is_z_hit(self, step: int) -> bool:
+        if step < self.offset:
+            return step in self.transient_z_hits
+        return any(step >= z_hit and (step - z_hit) % self.cycle_length == 0 for z_hit in self.cycle_z_hits)
+
+
+def combine_congruences(congruences: List[Tuple[int, int]]) -> Optional[Tuple[int, int]]:
+    """Generalised CRT: [(offset, period), ...] -> (offset, lcm of periods) of the n satisfying all of them, None if none does"""
+    offset, period = 0, 1
+    for other_offset, other_period in congruences:
+        g = gcd(period, other_period)
+        if (other_offset - offset) % g != 0:
+            return None
+        # offset + period*k = other_offset (mod other_period)
+        k = ((other_offset - offset) // g) * pow(period // g, -1, other_period // g) % (other_period // g)
+        offset += period*k
+        period = period // g * other_period
+        offset %= period
+    return offset, period
+
+
+@dataclass
+class CompiledMap:
+    """Nodes as int indexes, full path passes as jumps doubled in size, levels[k] moves 2**k passes at once"""
+
+    positions: List[str]
+    position_indexes: Dict[str, int]
+    left: np.ndarray
+    right: np.ndarray
+    is_final: np.ndarray
+    path: str
+    pass_jumps: np.ndarray  # pass_jumps[k, node] node reached after 2**k full passes
+    pass_has_final: np.ndarray  # pass_has_final[k, node] a Z position is hit within those passes
+    first_final_step: np.ndarray  # first step of a single pass on a Z position, 0 if none
+
+    def get_indexes(self, positions: List[str]) -> np.ndarray:
+        return np.array([self.position_indexes[position] for position in positions], dtype=np.int32)
+
+    def get_positions(self, indexes: np.ndarray) -> List[str]:
+        return [self.positions[index] for index in indexes]
+
+    def walk_steps(self, indexes: np.ndarray, n_steps: int) -> np.ndarray:
+        for turn in self.path[:n_steps]:
+            indexes = self.left[indexes] if turn == 'L' else self.right[indexes]
+        return indexes
+
+    def position_after(self, starting_positions: List[str], n_steps: int) -> List[str]:
+        """Positions after n_steps for all the starting positions, log2(n_steps / len(path)) jumps plus a partial pass"""
+        n_passes, n_last_steps = divmod(n_steps, len(self.path))
+        if n_passes >= 1 << len(self.pass_jumps):
+            raise ValueError(f'{n_steps} steps is beyond the {len(self.pass_jumps)} compiled jump levels')
+        indexes = self.get_indexes(positions=starting_positions)
+        for level in range(len(self.pass_jumps)):
+            if (n_passes >> level) & 1:
+                indexes = self.pass_jumps[level][indexes]
+        return self.get_positions(indexes=self.walk_steps(indexes=indexes, n_steps=n_last_steps))
+
+    def first_final_hit(self, starting_positions: List[str]) -> List[int]:
+        """Steps until each starting position first reaches a Z position, -1 if not within the compiled jump levels"""
+        indexes = self.get_indexes(positions=starting_positions)
+        n_passes = np.zeros(len(indexes), dtype=np.int64)
+        # largest number of passes without any Z, greedy from the biggest jump
+        for level in range(len(self.pass_jumps) - 1, -1, -1):
+            no_final = ~self.pass_has_final[level][indexes]
+            indexes = np.where(no_final, self.pass_jumps[level][indexes], indexes)
+            n_passes += no_final.astype(np.int64) << level
+        first_final_step = self.first_final_step[indexes]
+        steps = n_passes*len(self.path) + first_final_step
+        return [int(step) if final_step > 0 else -1 for step, final_step in zip(steps, first_final_step)]
+
+
 @dataclass
 class Map:
 
@@ -87,6 +182,80 @@ class Map:
                 if self.is_destination_reached_all(current_positions=starting_positions):
                     return i
 
+    def compile(self, path: str, n_levels: int=40) -> CompiledMap:
+        positions = list(self.coordinates.keys())
+        position_indexes = {position: i for i, position in enumerate(positions)}
+        left = np.array([position_indexes[self.go_left(starting_position=position)] for position in positions], dtype=np.int32)
+        right = np.array([position_indexes[self.go_right(starting_position=position)] for position in positions], dtype=np.int32)
+        is_final = np.array([position[-1] == 'Z' for position in positions], dtype=bool)
+        # one full pass from every node at once
+        indexes = np.arange(len(positions), dtype=np.int32)
+        first_final_step = np.zeros(len(positions), dtype=np.int64)
+        for i, turn in enumerate(path, start=1):
+            indexes = left[indexes] if turn == 'L' else right[indexes]
+            first_final_step = np.where((first_final_step == 0) & is_final[indexes], i, first_final_step)
+        pass_jumps = np.empty((n_levels, len(positions)), dtype=np.int32)
+        pass_has_final = np.empty((n_levels, len(positions)), dtype=bool)
+        pass_jumps[0] = indexes
+        pass_has_final[0] = first_final_step > 0
+        for level in range(1, n_levels):
+            pass_jumps[level] = pass_jumps[level - 1][pass_jumps[level - 1]]
+            pass_has_final[level] = pass_has_final[level - 1] | pass_has_final[level - 1][pass_jumps[level - 1]]
+        return CompiledMap(
+            positions=positions,
+            position_indexes=position_indexes,
+            left=left,
+            right=right,
+            is_final=is_final,
+            path=path,
+            pass_jumps=pass_jumps,
+            pass_has_final=pass_has_final,
+            first_final_step=first_final_step,
+        )
+
+    def get_ghost_cycle(self, path: str, starting_position: str) -> GhostCycle:
+        position = starting_position
+        seen_states = {(position, 0): 0}
+        z_hits = []
+        i = 0
+        while(True):
+            turn = path[i % len(path)]
+            i += 1
+            position = self.go_left(starting_position=position) if turn == 'L' else self.go_right(starting_position=position)
+            if position[-1] == 'Z':
+                z_hits.append(i)
+            state = (position, i % len(path))
+            if state in seen_states:
+                offset = seen_states[state]
+                # last hit is the state closing the cycle, already counted at offset unless that is the start
+                if offset > 0:
+                    z_hits = [z_hit for z_hit in z_hits if z_hit < i]
+                return GhostCycle(starting_position=starting_position, offset=offset, cycle_length=i - offset, z_hits=z_hits)
+            seen_states[state] = i
+
+    def ghost_steps(self, path: str, starting_positions: List[str]=None) -> Optional[int]:
+        """Steps until all ghosts are on a Z position at once, from each ghost cycle combined via CRT, None if never"""
+        starting_positions = starting_positions if starting_positions is not None else [position for position in self.coordinates.keys() if position[-1] == 'A']
+        ghost_cycles = [self.get_ghost_cycle(path=path, starting_position=starting_position) for starting_position in starting_positions]
+        for ghost_cycle in ghost_cycles:
+            if ghost_cycle.has_several_z_hits:
+                print(f'ghost from {ghost_cycle.starting_position} hits Z {len(ghost_cycle.cycle_z_hits)} times every {ghost_cycle.cycle_length} steps: {ghost_cycle.cycle_z_hits}')
+        candidates = []
+        # hits before the cycles start happen once, check them against every ghost
+        for ghost_cycle in ghost_cycles:
+            for z_hit in ghost_cycle.transient_z_hits:
+                if all(other_cycle.is_z_hit(step=z_hit) for other_cycle in ghost_cycles):
+                    candidates.append(z_hit)
+        # any combination of in cycle hits, one per ghost
+        for z_hits in product(*[ghost_cycle.cycle_z_hits for ghost_cycle in ghost_cycles]):
+            combined = combine_congruences(congruences=[(z_hit, ghost_cycle.cycle_length) for z_hit, ghost_cycle in zip(z_hits, ghost_cycles)])
+            if combined is None:
+                continue
+            offset, period = combined
+            min_step = max(z_hits)
+            candidates.append(offset + (min_step - offset + period - 1) // period * period)
+        return min(candidates) if candidates else None
+
 if __name__ == '__main__':
     # pos_test_description = 'GDS = (PJT, DBD)'
     # pos_test = Coordinate.from_description(pos_test_description)
@@ -144,6 +313,11 @@ if __name__ == '__main__':
     print(f'steps from start to end required following path are {steps_start_to_end}')
     starting_positions = [coord_position for coord_position in map.coordinates.keys() if coord_position[-1] == 'A']
     print(starting_positions)
-    steps_start_to_end_ghosts = map.get_number_steps_from_start_to_end_all(path=path, starting_positions=starting_positions)
+    # steps_start_to_end_ghosts = map.get_number_steps_from_start_to_end_all(path=path, starting_positions=starting_positions)
+    # print(f'steps from start to end for ghosts (end with A) required following path are {steps_start_to_end_ghosts}')
+    steps_start_to_end_ghosts = map.ghost_steps(path=path, starting_positions=starting_positions)
     print(f'steps from start to end for ghosts (end with A) required following path are {steps_start_to_end_ghosts}')
+    compiled_map = map.compile(path=path)
+    print(f'first Z hit for each ghost is {compiled_map.first_final_hit(starting_positions=starting_positions)}')
+    print(f'ghosts are on {compiled_map.position_after(starting_positions=starting_positions, n_steps=steps_start_to_end_ghosts)} after {steps_start_to_end_ghosts} steps')
     
\ No newline at end of file
@@ -1,5 +1,9 @@
 from dataclasses import dataclass
-from typing import List, Iterable
+from typing import List, Iterable, Dict
+from math import comb
+import numpy as np
+
+INT64_LIMIT = 2**63 - 1
 
 @dataclass
 class History:
@@ -42,6 +46,51 @@ class History:
             factor = element - factor
         return factor
 
+@dataclass
+class HistoryBatch:
+
+    matrix: np.ndarray  # one history per row, all of the same length
+
+    @staticmethod
+    def from_histories(histories: Iterable[History]) -> List['HistoryBatch']:
+        """One batch per sequence length, int64 matrix unless values overflow it"""
+        sequences_by_length: Dict[int, List[List[int]]] = {}
+        for history in histories:
+            sequences_by_length.setdefault(len(history.sequence), []).append(history.sequence)
+        return [HistoryBatch(matrix=np.array(sequences, dtype=np.int64 if HistoryBatch.fits_int64(sequences) else object)) for sequences in sequences_by_length.values()]
+
+    @staticmethod
+    def fits_int64(sequences: List[List[int]]) -> bool:
+        return max(abs(el) for sequence in sequences for el in sequence) <= INT64_LIMIT
+
+    @property
+    def sequence_length(self) -> int:
+        return self.matrix.shape[1]
+
+    @property
+    def forward_weights(self) -> List[int]:
+        """Next element as binomial combination of the sequence: differences down to the last level summed up"""
+        n = self.sequence_length
+        return [(-1)**(n - 1 - k)*comb(n, k) for k in range(n)]
+
+    @property
+    def backward_weights(self) -> List[int]:
+        n = self.sequence_length
+        return [(-1)**k*comb(n, k + 1) for k in range(n)]
+
+    def extrapolate(self, weights: List[int]) -> np.ndarray:
+        """Single matrix-vector product, on python ints when int64 could overflow"""
+        max_abs_value = int(np.abs(self.matrix).max()) if self.matrix.size else 0
+        if self.matrix.dtype != object and max_abs_value*sum(abs(weight) for weight in weights) <= INT64_LIMIT:
+            return self.matrix @ np.array(weights, dtype=np.int64)
+        return self.matrix.astype(object) @ np.array(weights, dtype=object)
+
+    def get_history_factors(self) -> np.ndarray:
+        return self.extrapolate(weights=self.forward_weights)
+
+    def get_history_back_factors(self) -> np.ndarray:
+        return self.extrapolate(weights=self.backward_weights)
+
 if __name__ == '__main__':
     # h1_description = '1 3 6 10 15 21'
     # h1 = History(sequence=[1, 3, 6, 10, 15, 21])
@@ -69,4 +118,7 @@ if __name__ == '__main__':
     with open(".\ecological_history.txt", "r") as fr:
         histories = [History.from_description(history_descriptions)for history_descriptions in fr]
     print(f'Factor from histories is {sum([h.get_history_factor() for h in histories])}')
-    print(f'Factor from backward histories is {sum([h.get_history_back_factor() for h in histories])}')
\ No newline at end of file
+    print(f'Factor from backward histories is {sum([h.get_history_back_factor() for h in histories])}')
+    history_batches = HistoryBatch.from_histories(histories=histories)
+    print(f'Factor from histories batch is {sum(int(hb.get_history_factors().sum()) for hb in history_batches)}')
+    print(f'Factor from backward histories batch is {sum(int(hb.get_history_back_factors().sum()) for hb in history_batches)}')
\ No newline at end of file